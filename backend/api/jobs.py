@@ -0,0 +1,119 @@
+import itertools
+import math
+import queue
+import threading
+import time
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job is submitted while the queue is at capacity.
+    `retry_after` is the suggested wait in seconds before trying again.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a fixed pool of worker threads fed by a bounded priority queue.
+
+    Jobs are keyed by an id (the video_id); submitting an id that is already queued or
+    running returns the existing job instead of starting a second one. When the queue is
+    full, `submit` raises JobQueueFull with a Retry-After estimate based on recent job
+    durations. Workers live in the API process, so they share the models loaded by the
+    model registry between jobs.
+    """
+
+    def __init__(self, run_fn, max_workers=2, max_queue_size=16):
+        self.run_fn = run_fn
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._queue = queue.PriorityQueue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._workers = []
+        self._recent_seconds = []
+
+    def _ensure_workers(self):
+        if self._workers:
+            return
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"flickd-job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job_id, payload, priority=0):
+        """
+        Queues a job unless one with the same id is already in flight.
+
+        Args:
+            job_id (str): Job key, used for deduplication.
+            payload (Any): Argument passed to run_fn.
+            priority (int, optional): Higher values run first. Defaults to 0.
+
+        Returns:
+            tuple: (state, created) where state is "queued" or "running" and created is
+                False if an in-flight job with this id already existed.
+
+        Raises JobQueueFull if the queue is at capacity.
+        """
+        with self._lock:
+            if job_id in self._jobs:
+                return self._jobs[job_id]["state"], False
+            if self.queue_depth() >= self.max_queue_size:
+                raise JobQueueFull(self.retry_after())
+            self._jobs[job_id] = {"state": "queued", "priority": priority, "submitted_at": time.time()}
+            self._ensure_workers()
+            self._queue.put((-priority, next(self._counter), job_id, payload))
+            logger.info(f"Queued job {job_id} (priority {priority}, depth {self.queue_depth()}).")
+            return "queued", True
+
+    def _worker(self):
+        while True:
+            _, _, job_id, payload = self._queue.get()
+            with self._lock:
+                self._jobs[job_id]["state"] = "running"
+            start = time.perf_counter()
+            try:
+                self.run_fn(payload)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+                    self._recent_seconds = (self._recent_seconds + [elapsed])[-20:]
+                self._queue.task_done()
+
+    def status(self, job_id):
+        """
+        Returns "queued" or "running" for an in-flight job, or None if the id is not in flight.
+        """
+        job = self._jobs.get(job_id)
+        return job["state"] if job else None
+
+    def queue_depth(self):
+        """
+        Returns the number of jobs waiting to start.
+        """
+        return sum(1 for job in self._jobs.values() if job["state"] == "queued")
+
+    def in_flight(self):
+        """
+        Returns the number of jobs that are queued or running.
+        """
+        return len(self._jobs)
+
+    def retry_after(self):
+        """
+        Estimates how many seconds until a queue slot frees up, from recent job durations.
+        """
+        average = sum(self._recent_seconds) / len(self._recent_seconds) if self._recent_seconds else 60.0
+        return max(1, math.ceil(average / max(1, self.max_workers)))
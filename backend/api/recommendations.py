@@ -1,10 +1,12 @@
-from fastapi import APIRouter, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
 import json
 import main_pipeline
-from config import OUTPUTS_DIR
+from config import OUTPUTS_DIR, JOB_WORKERS, JOB_QUEUE_SIZE
 from utils.cache import is_expired, delete_path
+from utils.metrics import JOB_QUEUE_DEPTH, JOBS_IN_FLIGHT
+from .jobs import JobManager, JobQueueFull
 
 router = APIRouter()
 
@@ -12,48 +14,72 @@ class RecommendationRequest(BaseModel):
     videoUrl: str
     caption: str = None
     hashtags: list[str] = None
+    priority: int = 0
+
+def run_and_track(req: RecommendationRequest):
+    video_id = os.path.splitext(os.path.basename(req.videoUrl))[0]
+    status_path = os.path.join(OUTPUTS_DIR, f"{video_id}.status")
+    os.makedirs(OUTPUTS_DIR, exist_ok=True)  # Ensure output dir exists
+    with open(status_path, "w") as f:
+        f.write("running")
+    try:
+        main_pipeline.run_pipeline(req)
+        with open(status_path, "w") as f:
+            f.write("done")
+    except Exception as e:
+        with open(status_path, "w") as f:
+            f.write(f"error: {str(e)}")
+
+job_manager = JobManager(run_and_track, max_workers=JOB_WORKERS, max_queue_size=JOB_QUEUE_SIZE)
+JOB_QUEUE_DEPTH.set_function(job_manager.queue_depth)
+JOBS_IN_FLIGHT.set_function(job_manager.in_flight)
 
 @router.post("/api/recommendations")
-def recommend(req: RecommendationRequest, background_tasks: BackgroundTasks):
+def recommend(req: RecommendationRequest):
     video_id = os.path.splitext(os.path.basename(req.videoUrl))[0]
     output_path = os.path.join(OUTPUTS_DIR, f"{video_id}.json")
     status_path = os.path.join(OUTPUTS_DIR, f"{video_id}.status")
     frames_path = os.path.join("../data/frames", video_id)
     transcript_path = os.path.join("../data/transcripts", f"{video_id}_transcript.txt")
 
-    expired = False
-    for path in [output_path, frames_path, transcript_path]:
+    if job_manager.status(video_id):
+        return {"status": "pending", "video_id": video_id}
+
+    # Results are keyed by video content and pipeline config, so they never expire;
+    # only intermediate frames and transcripts are cleaned up after a while
+    for path in [frames_path, transcript_path]:
         if is_expired(path):
             delete_path(path)
-            expired = True
-    if expired and os.path.exists(status_path):
-        os.remove(status_path)
 
-    def run_and_track():
-        os.makedirs(OUTPUTS_DIR, exist_ok=True)  # Ensure output dir exists
-        with open(status_path, "w") as f:
-            f.write("running")
-        try:
-            main_pipeline.run_pipeline(req)
-            with open(status_path, "w") as f:
-                f.write("done")
-        except Exception as e:
-            with open(status_path, "w") as f:
-                f.write(f"error: {str(e)}")
+    cached = main_pipeline.lookup_cached_result(req.videoUrl)
+    if cached is not None:
+        return {"status": "success", "data": {**cached, "video_id": video_id}}
 
-    if not os.path.exists(output_path):
-        background_tasks.add_task(run_and_track)
-        return {"status": "pending", "video_id": video_id}
-    else:
-        with open(output_path) as f:
-            data = json.load(f)
-        return {"status": "success", "data": data}
+    # A miss means no result for this content under the current config; any leftover
+    # output under this basename is stale or belongs to a different video
+    for path in [output_path, status_path]:
+        if os.path.exists(path):
+            os.remove(path)
+    try:
+        job_manager.submit(video_id, req, priority=req.priority)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many videos are being processed; please retry later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return {"status": "pending", "video_id": video_id}
 
 @router.get("/api/recommendations/status/{video_id}")
 def get_recommendation_status(video_id: str):
     output_path = os.path.join(OUTPUTS_DIR, f"{video_id}.json")
     status_path = os.path.join(OUTPUTS_DIR, f"{video_id}.status")
-    if os.path.exists(output_path):
+    job_status = job_manager.status(video_id)
+    if job_status == "queued":
+        return {"status": "queued"}
+    elif job_status == "running":
+        return {"status": "running"}
+    elif os.path.exists(output_path):
         with open(output_path) as f:
             data = json.load(f)
         return {"status": "success", "data": data}
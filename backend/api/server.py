@@ -1,13 +1,23 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .recommendations import router as recommendations_router
 from .videos import router as videos_router
-from config import VIDEOS_DIR
+from .metrics import router as metrics_router
+from config import VIDEOS_DIR, WARMUP_MODELS
+from main_pipeline import PipelineConfig
+from utils.model_registry import get_model_registry
+from utils.catalog_index import get_catalog_index
+from utils.checks import file_exists
+from utils.metrics import HTTP_REQUEST_SECONDS
+from utils.logger import get_logger
 from .exceptions import http_exception_handler, validation_exception_handler, generic_exception_handler
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+logger = get_logger(__name__)
+
 app = FastAPI()
 
 app.add_middleware(
@@ -20,9 +30,51 @@ app.add_middleware(
 
 app.include_router(recommendations_router)
 app.include_router(videos_router)
+app.include_router(metrics_router)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Observes each request's duration, labelled by route template (not the raw path, so
+    video ids do not create new series) and status code.
+    """
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", "other")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route, status=status)
 
 app.mount("/videos", StaticFiles(directory=VIDEOS_DIR), name="videos")
 
+@app.on_event("startup")
+def warmup_models():
+    """
+    Loads the pipeline's models and the catalog FAISS index once per worker process so requests reuse them.
+    """
+    if not WARMUP_MODELS:
+        return
+    config = PipelineConfig()
+    get_model_registry().warmup(
+        yolo_model_path=config.yolo_model,
+        clip_model_name=config.clip_model,
+        whisper_model_size=config.model_size,
+    )
+    if file_exists(config.catalog_embeddings_file) and file_exists(config.catalog_product_ids_file):
+        try:
+            get_catalog_index(
+                config.catalog_embeddings_file,
+                config.catalog_product_ids_file,
+                config.catalog_csv_file,
+                config.catalog_index_file,
+                spec=config.index_spec(),
+            )
+        except Exception as e:
+            logger.error(f"Catalog index warmup failed: {e}", exc_info=True)
+
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
 app.add_exception_handler(Exception, generic_exception_handler)
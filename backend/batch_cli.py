@@ -0,0 +1,255 @@
+"""
+Offline batch runner for the Flickd pipeline.
+
+Processes every video in VIDEOS_DIR (or the videos listed in a manifest) on a pool of worker
+processes, each of which loads the models and the catalog index once at startup. Videos with a
+valid output are skipped, so an interrupted run picks up where it left off; every finished
+video's result (status, timings, frame count) is appended to a JSON-lines state file. Throughput and a per-stage time breakdown are
+printed at the end.
+
+Run from the backend directory:
+
+    python batch_cli.py --workers 2
+    python batch_cli.py --manifest reels.jsonl --workers 4 --vibe-engine local
+
+A manifest is a JSON list or a JSON-lines file of objects with videoUrl and optional caption
+and hashtags. When walking VIDEOS_DIR, caption and hashtags are read from a <video>.json file
+next to the video if there is one.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from config import VIDEOS_DIR, VIDEOS_URL_PATH, OUTPUTS_DIR
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".mkv", ".webm", ".avi")
+
+_worker_config = None
+
+
+def video_id_for(video_url):
+    return os.path.splitext(os.path.basename(video_url))[0]
+
+
+def discover_videos(videos_dir=VIDEOS_DIR):
+    """
+    Returns video items for every video file under videos_dir, addressed through the /videos mount
+    so the pipeline opens them in place.
+    """
+    items = []
+    for root, _, files in os.walk(videos_dir):
+        for name in sorted(files):
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, videos_dir).replace(os.sep, "/")
+            item = {"videoUrl": f"{VIDEOS_URL_PATH}{relative}", "caption": None, "hashtags": None}
+            sidecar = f"{os.path.splitext(path)[0]}.json"
+            if os.path.isfile(sidecar):
+                with open(sidecar, "r") as f:
+                    meta = json.load(f)
+                item["caption"] = meta.get("caption")
+                item["hashtags"] = meta.get("hashtags")
+            items.append(item)
+    return sorted(items, key=lambda item: item["videoUrl"])
+
+
+def load_manifest(manifest_path):
+    """
+    Reads video items from a JSON list or a JSON-lines manifest.
+    """
+    with open(manifest_path, "r") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        items = json.loads(content)
+    else:
+        items = [json.loads(line) for line in content.splitlines() if line.strip()]
+    for item in items:
+        if "videoUrl" not in item:
+            raise ValueError(f"Manifest entry without videoUrl: {item}")
+    return items
+
+
+def has_valid_output(video_url, outputs_dir=OUTPUTS_DIR):
+    """
+    Returns True if the video's output JSON exists, parses, and has the expected shape.
+    Outputs cut short by an interruption fail to parse and are redone.
+    """
+    path = os.path.join(outputs_dir, f"{video_id_for(video_url)}.json")
+    try:
+        with open(path, "r") as f:
+            output = json.load(f)
+        return (
+            output.get("video_id") == video_id_for(video_url)
+            and isinstance(output.get("vibes"), list)
+            and isinstance(output.get("products"), list)
+        )
+    except (OSError, ValueError):
+        return False
+
+
+def _init_worker(config):
+    """
+    Process pool initializer: loads the models and the catalog index once per worker process.
+    """
+    global _worker_config
+    from utils.model_registry import get_model_registry
+    from utils.catalog_index import get_catalog_index
+    from utils.checks import file_exists
+    _worker_config = config
+    get_model_registry().warmup(
+        yolo_model_path=config.yolo_model,
+        clip_model_name=config.clip_model,
+        whisper_model_size=config.model_size,
+    )
+    if not (file_exists(config.catalog_embeddings_file) and file_exists(config.catalog_product_ids_file)):
+        return
+    try:
+        get_catalog_index(
+            config.catalog_embeddings_file,
+            config.catalog_product_ids_file,
+            config.catalog_csv_file,
+            config.catalog_index_file,
+            spec=config.index_spec(),
+        )
+    except Exception as e:
+        logger.error(f"Catalog index preload failed in worker {os.getpid()}: {e}", exc_info=True)
+
+
+def _process_video(video_item):
+    """
+    Runs the pipeline for one video in a worker process and returns its result record.
+    """
+    import main_pipeline
+    start = time.perf_counter()
+    result = {"videoUrl": video_item["videoUrl"], "video_id": video_id_for(video_item["videoUrl"]), "worker": os.getpid()}
+    pipeline = None
+    try:
+        pipeline = main_pipeline.FlickdPipeline(video_item, _worker_config)
+        pipeline.run()
+        result["status"] = "done"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["frames"] = pipeline.frames_sampled if pipeline else None
+    result["stage_report"] = pipeline.stage_report if pipeline else None
+    return result
+
+
+def summarize(results, wall_seconds):
+    """
+    Returns throughput and the per-stage time breakdown of the processed videos.
+    """
+    done = [r for r in results if r["status"] == "done"]
+    frames = sum(r.get("frames") or 0 for r in done)
+    stage_seconds = {}
+    for r in done:
+        for stage, timing in ((r.get("stage_report") or {}).get("stages") or {}).items():
+            stage_seconds.setdefault(stage, []).append(timing["seconds"])
+    total_stage_seconds = sum(sum(v) for v in stage_seconds.values()) or 1.0
+    return {
+        "videos_done": len(done),
+        "videos_failed": len(results) - len(done),
+        "wall_seconds": round(wall_seconds, 1),
+        "videos_per_min": round(len(done) / wall_seconds * 60, 2) if wall_seconds else None,
+        "frames_per_sec": round(frames / wall_seconds, 2) if wall_seconds else None,
+        "stages": {
+            stage: {
+                "total_seconds": round(sum(seconds), 2),
+                "mean_seconds": round(sum(seconds) / len(seconds), 3),
+                "share": round(sum(seconds) / total_stage_seconds, 3),
+            }
+            for stage, seconds in sorted(stage_seconds.items(), key=lambda kv: -sum(kv[1]))
+        },
+    }
+
+
+def print_summary(summary):
+    print(f"\n{summary['videos_done']} videos done, {summary['videos_failed']} failed in {summary['wall_seconds']}s")
+    print(f"Throughput: {summary['videos_per_min']} videos/min, {summary['frames_per_sec']} frames/sec")
+    if summary["stages"]:
+        print(f"{'stage':<12}{'total s':>10}{'mean s':>10}{'share':>8}")
+        for stage, row in summary["stages"].items():
+            print(f"{stage:<12}{row['total_seconds']:>10}{row['mean_seconds']:>10}{row['share']:>8.1%}")
+
+
+def main(argv=None):
+    import main_pipeline
+    parser = argparse.ArgumentParser(description="Run the Flickd pipeline over many videos.")
+    parser.add_argument("--manifest", help="JSON or JSON-lines file of video items; defaults to every video in VIDEOS_DIR.")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes.")
+    parser.add_argument("--state-file", default=os.path.join(OUTPUTS_DIR, "batch_state.jsonl"), help="JSON-lines log of per-video results.")
+    parser.add_argument("--force", action="store_true", help="Reprocess videos that already have a valid output.")
+    parser.add_argument("--limit", type=int, help="Process at most this many videos.")
+    parser.add_argument("--frame-rate", type=int, help="Override PipelineConfig.frame_rate.")
+    parser.add_argument("--sampling-mode", choices=("grab", "seek", "scene"), help="Override PipelineConfig.sampling_mode.")
+    parser.add_argument("--vibe-engine", choices=("auto", "llm", "local"), help="Override PipelineConfig.vibe_engine.")
+    parser.add_argument("--summary-file", help="Also write the run summary as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    config = main_pipeline.PipelineConfig()
+    overrides = {"frame_rate": args.frame_rate, "sampling_mode": args.sampling_mode, "vibe_engine": args.vibe_engine}
+    config = replace(config, **{k: v for k, v in overrides.items() if v is not None})
+
+    items = load_manifest(args.manifest) if args.manifest else discover_videos()
+    todo = [item for item in items if args.force or not has_valid_output(item["videoUrl"], config.outputs_dir)]
+    if args.limit is not None:
+        todo = todo[:args.limit]
+    print(f"{len(items)} videos found, {len(items) - len(todo)} skipped, {len(todo)} to process with {args.workers} workers.")
+    if not todo:
+        return 0
+
+    os.makedirs(os.path.dirname(args.state_file) or ".", exist_ok=True)
+    results = []
+    started_at = time.perf_counter()
+    # spawn: forked children would inherit torch/OpenCV threads in an undefined state
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=_init_worker, initargs=(config,))
+    try:
+        futures = {executor.submit(_process_video, item): item for item in todo}
+        with open(args.state_file, "a") as state:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # A crashed worker (BrokenProcessPool, OOM kill) or an error outside the pipeline
+                    item = futures[future]
+                    logger.error(f"Worker failed on {item['videoUrl']}: {e}", exc_info=True)
+                    result = {
+                        "videoUrl": item["videoUrl"],
+                        "video_id": video_id_for(item["videoUrl"]),
+                        "status": "failed",
+                        "error": f"{type(e).__name__}: {e}",
+                        "seconds": None,
+                        "frames": None,
+                        "stage_report": None,
+                    }
+                results.append(result)
+                state.write(json.dumps(result) + "\n")
+                state.flush()
+                print(f"[{len(results)}/{len(todo)}] {result['status']:<6} {result['video_id']} "
+                      f"({result['seconds'] if result['seconds'] is not None else '?'}s, {result.get('frames') or 0} frames){' - ' + result['error'] if 'error' in result else ''}")
+    except KeyboardInterrupt:
+        print("\nInterrupted; finished videos have their outputs and will be skipped on the next run.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        summary = summarize(results, time.perf_counter() - started_at)
+        print_summary(summary)
+        if args.summary_file:
+            with open(args.summary_file, "w") as f:
+                json.dump(summary, f, indent=2)
+    executor.shutdown()
+    return 0 if summary["videos_failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
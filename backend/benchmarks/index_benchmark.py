@@ -0,0 +1,135 @@
+"""
+Recall@k vs latency benchmark of the catalog FAISS index types against exact (flat) search.
+
+Run from the backend directory:
+
+    python -m benchmarks.index_benchmark --k 10 --queries 500
+    python -m benchmarks.index_benchmark --synthetic 200000 --output outputs/index_benchmark.json
+
+Queries are catalog vectors with a little Gaussian noise added (a stand-in for crop
+embeddings of catalog products), so the exact neighbours are known from the flat index.
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+from config import CATALOG_EMBEDDINGS_PATH
+from utils.catalog_index import IndexSpec, build_catalog_index, apply_search_params
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SPECS = [
+    IndexSpec("ivf_flat", nprobe=1),
+    IndexSpec("ivf_flat", nprobe=8),
+    IndexSpec("ivf_flat", nprobe=32),
+    IndexSpec("hnsw", ef_search=16),
+    IndexSpec("hnsw", ef_search=64),
+    IndexSpec("hnsw", ef_search=256),
+    IndexSpec("ivf_pq", nprobe=8),
+    IndexSpec("ivf_pq", nprobe=32),
+]
+
+
+def _normalize(x):
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def make_queries(embeddings, n_queries, noise=0.05, seed=0):
+    """
+    Returns n_queries normalized queries made by perturbing randomly chosen catalog vectors.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[picks] + rng.normal(0, noise, size=(len(picks), embeddings.shape[1]))
+    return _normalize(queries)
+
+
+def recall_at_k(found, truth):
+    """
+    Returns the mean fraction of the exact top-k neighbours that were found.
+    """
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def time_search(index, queries, k):
+    """
+    Returns (indices, per-query latency in ms for one-at-a-time search, batched throughput in queries/sec).
+    """
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q[None, :], k)
+    single_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    start = time.perf_counter()
+    _, indices = index.search(queries, k)
+    batch_qps = len(queries) / max(time.perf_counter() - start, 1e-9)
+    return indices, single_ms, batch_qps
+
+
+def benchmark(embeddings, specs, k=10, n_queries=500):
+    """
+    Builds each index in specs and measures recall@k against flat search and search latency.
+
+    Returns:
+        list[dict]: One row per spec (flat first) with build_key, search params, build_seconds,
+            recall_at_k, single_query_ms and batch_qps.
+    """
+    queries = make_queries(embeddings, n_queries)
+    rows = []
+    built = {}
+    truth = None
+    for spec in [IndexSpec("flat")] + list(specs):
+        if spec.build_key() not in built:
+            start = time.perf_counter()
+            built[spec.build_key()] = (build_catalog_index(embeddings, spec=spec), time.perf_counter() - start)
+        index, build_seconds = built[spec.build_key()]
+        apply_search_params(index, spec)
+        indices, single_ms, batch_qps = time_search(index, queries, k)
+        if truth is None:
+            truth = indices
+        rows.append({
+            "index": spec.build_key(),
+            "nprobe": spec.nprobe if spec.index_type in ("ivf_flat", "ivf_pq") else None,
+            "ef_search": spec.ef_search if spec.index_type == "hnsw" else None,
+            "build_seconds": round(build_seconds, 3),
+            f"recall_at_{k}": round(recall_at_k(indices, truth), 4),
+            "single_query_ms": round(single_ms, 3),
+            "batch_qps": round(batch_qps, 1),
+        })
+        logger.info(f"Index benchmark: {rows[-1]}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of catalog FAISS index types.")
+    parser.add_argument("--embeddings", default=CATALOG_EMBEDDINGS_PATH, help="Catalog embeddings (.npy) to index.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many random unit vectors instead of the catalog.")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension of synthetic vectors.")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query.")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries.")
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        embeddings = _normalize(np.random.default_rng(1).normal(size=(args.synthetic, args.dim)))
+    else:
+        embeddings = np.load(args.embeddings).astype(np.float32)
+    rows = benchmark(embeddings, DEFAULT_SPECS, k=args.k, n_queries=args.queries)
+
+    recall_key = f"recall_at_{args.k}"
+    print(f"{len(embeddings)} vectors, dim {embeddings.shape[1]}, {min(args.queries, len(embeddings))} queries, k={args.k}")
+    print(f"{'index':<24}{'nprobe':>8}{'ef':>6}{'build s':>10}{recall_key:>14}{'ms/query':>10}{'batch q/s':>12}")
+    for row in rows:
+        print(f"{row['index']:<24}{row['nprobe'] or '-':>8}{row['ef_search'] or '-':>6}{row['build_seconds']:>10}"
+              f"{row[recall_key]:>14}{row['single_query_ms']:>10}{row['batch_qps']:>12}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"vectors": len(embeddings), "dim": int(embeddings.shape[1]), "k": args.k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
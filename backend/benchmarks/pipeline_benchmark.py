@@ -0,0 +1,343 @@
+"""
+Per-stage benchmark of the Flickd pipeline on synthetic reels.
+
+Generates a synthetic video (known duration, fps and resolution, with moving coloured
+"garments" at known positions) and times each stage on it: frame extraction, YOLO detection,
+cropping, CLIP embedding, FAISS search, transcription and vibe classification. Results are
+written as JSON so runs can be compared between commits.
+
+Run from the backend directory:
+
+    python -m benchmarks.pipeline_benchmark --models random --output outputs/bench_new.json
+    python -m benchmarks.pipeline_benchmark --models pretrained --seconds 30 --fps 30 --width 1080 --height 1920
+    python -m benchmarks.pipeline_benchmark compare outputs/bench_old.json outputs/bench_new.json
+
+--models random builds small random-weight models (YOLO from yolov8n.yaml, a 2-layer CLIP) and
+skips Whisper unless --whisper is given, so it runs offline on CPU. The vibe LLM is timed
+against an in-process mock OpenAI-compatible server. --models pretrained uses the models from
+PipelineConfig.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import cv2
+import numpy as np
+
+from main_pipeline import PipelineConfig
+from components.extract_frames import sample_frames
+from components.detect import detect_fashion_items_batch
+from components.transcribe import transcribe_audio
+from components.vibe import vibe_classification_local, groq_llm_vibes
+from utils.crop import crop_array_to_pil
+from utils.extract_catalog_embeddings import get_clip_embeddings
+from utils.catalog_index import CatalogIndex, IndexSpec, build_catalog_index
+from utils.llm_client import LLMClient
+from utils.model_registry import get_model_registry
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RANDOM_YOLO = "yolov8n.yaml"
+RANDOM_CLIP = "random-clip"
+GARMENT_COLOURS = [(40, 40, 200), (200, 120, 40), (60, 180, 60), (180, 60, 180)]
+
+
+def garment_boxes(frame_index, width, height, count=3):
+    """
+    Returns the [x, y, w, h] boxes of the synthetic garments in a frame; they drift slowly so
+    consecutive frames overlap, like a real reel.
+    """
+    boxes = []
+    for i in range(count):
+        w, h = width // 4, height // 3
+        x = int((width - w) * (0.1 + 0.25 * i) + 3 * frame_index) % max(1, width - w)
+        y = int((height - h) * (0.2 + 0.2 * i) + 2 * frame_index) % max(1, height - h)
+        boxes.append([x, y, w, h])
+    return boxes
+
+
+def make_synthetic_video(path, seconds=10, fps=30, width=720, height=1280, with_audio=False):
+    """
+    Writes a synthetic reel to path and returns its properties. With with_audio, a sine tone is
+    muxed in with ffmpeg (if available) so transcription has something to decode.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    background = np.tile(np.linspace(60, 200, width, dtype=np.uint8)[None, :, None], (height, 1, 3))
+    n_frames = int(seconds * fps)
+    for frame_index in range(n_frames):
+        frame = background.copy()
+        for colour, (x, y, w, h) in zip(GARMENT_COLOURS, garment_boxes(frame_index, width, height)):
+            cv2.rectangle(frame, (x, y), (x + w, y + h), colour, thickness=-1)
+        writer.write(frame)
+    writer.release()
+    audio = False
+    if with_audio and shutil.which("ffmpeg"):
+        muxed = f"{path}.audio.mp4"
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", path, "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+             "-c:v", "copy", "-c:a", "aac", "-shortest", muxed],
+            check=True
+        )
+        os.replace(muxed, path)
+        audio = True
+    return {"seconds": seconds, "fps": fps, "width": width, "height": height, "frames": n_frames, "audio": audio}
+
+
+class _StubCLIPProcessor:
+    """
+    Offline stand-in for CLIPProcessor: real CLIP image preprocessing, and text "tokenized"
+    into deterministic ids so the random text tower can run without tokenizer files.
+    """
+
+    def __init__(self, vocab_size, max_length=16):
+        from transformers import CLIPImageProcessor
+        self.image_processor = CLIPImageProcessor()
+        self.vocab_size = vocab_size
+        self.max_length = max_length
+
+    def __call__(self, images=None, text=None, return_tensors="pt", **kwargs):
+        import torch
+        if images is not None:
+            return self.image_processor(images=images, return_tensors=return_tensors)
+        texts = [text] if isinstance(text, str) else list(text)
+        ids = [[(b % (self.vocab_size - 2)) + 1 for b in t.encode("utf-8")[:self.max_length]] for t in texts]
+        ids = [row + [0] * (self.max_length - len(row)) for row in ids]
+        input_ids = torch.tensor(ids, dtype=torch.long)
+        return {"input_ids": input_ids, "attention_mask": (input_ids > 0).long()}
+
+
+def register_random_models(registry):
+    """
+    Registers a small random-weight CLIP under RANDOM_CLIP. YOLO needs no registration:
+    ultralytics builds random weights from RANDOM_YOLO on load.
+    """
+    import torch
+    from transformers import CLIPConfig, CLIPModel
+    torch.manual_seed(0)
+    tower = {"hidden_size": 64, "intermediate_size": 128, "num_hidden_layers": 2, "num_attention_heads": 2}
+    config = CLIPConfig(
+        text_config={**tower, "vocab_size": 1000, "max_position_embeddings": 32},
+        vision_config={**tower, "image_size": 224, "patch_size": 32},
+        projection_dim=64,
+    )
+    model = CLIPModel(config).eval()
+    registry.put("clip", RANDOM_CLIP, (model, _StubCLIPProcessor(vocab_size=1000)))
+
+
+class _MockLLMHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"choices": [{"message": {"content": "['Boho', 'Y2K']"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_mock_llm():
+    """
+    Starts an OpenAI-compatible mock chat completions server on localhost and returns (server, base_url).
+    """
+    server = HTTPServer(("127.0.0.1", 0), _MockLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def time_stage(fn, repeat, items=None):
+    """
+    Runs fn repeat times and returns (last result, timing dict with runs, mean, median, min and
+    per-item milliseconds when items is given).
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    timing = {
+        "runs": [round(r, 4) for r in runs],
+        "mean_seconds": round(statistics.mean(runs), 4),
+        "median_seconds": round(statistics.median(runs), 4),
+        "min_seconds": round(min(runs), 4),
+    }
+    if items:
+        timing["items"] = items
+        timing["per_item_ms"] = round(1000 * statistics.median(runs) / items, 3)
+    return result, timing
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(args):
+    """
+    Generates the synthetic video, times every stage and returns the results dict.
+    """
+    registry = get_model_registry()
+    config = PipelineConfig()
+    if args.models == "random":
+        register_random_models(registry)
+        yolo_name, clip_name = RANDOM_YOLO, RANDOM_CLIP
+    else:
+        yolo_name, clip_name = config.yolo_model, config.clip_model
+    workdir = tempfile.mkdtemp(prefix="flickd-bench-")
+    video_path = os.path.join(workdir, "bench_reel.mp4")
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "models": {"mode": args.models, "yolo": yolo_name, "clip": clip_name, "whisper": args.whisper},
+            "args": vars(args),
+        },
+        "video": make_synthetic_video(video_path, args.seconds, args.fps, args.width, args.height, with_audio=args.whisper is not None),
+        "stages": {},
+        "model_load": {},
+    }
+    stages = results["stages"]
+    try:
+        def extract():
+            capture = cv2.VideoCapture(video_path)
+            try:
+                return sample_frames("bench_reel", capture, args.frame_rate, mode=args.sampling_mode)
+            finally:
+                capture.release()
+        frames, stages["extract_frames"] = time_stage(extract, args.repeat)
+        stages["extract_frames"]["frames_sampled"] = len(frames)
+
+        yolo = registry.get_yolo(yolo_name)
+        per_frame, stages["detect"] = time_stage(
+            lambda: detect_fashion_items_batch(frames, yolo_name, config.conf, batch_size=config.detect_batch_size, model=yolo),
+            args.repeat, items=len(frames)
+        )
+        stages["detect"]["detections"] = sum(len(d) for d in per_frame)
+
+        # Downstream stages use the known garment boxes so their work does not depend on detector quality
+        boxes = [
+            (frame, box)
+            for frame in frames
+            for box in garment_boxes(int(round(frame["timestamp"] * args.fps)), args.width, args.height)
+        ]
+        crops, stages["crop"] = time_stage(lambda: [crop_array_to_pil(f["image"], b) for f, b in boxes], args.repeat, items=len(boxes))
+
+        model, processor = registry.get_clip(clip_name)
+        embeddings, stages["clip_embed"] = time_stage(
+            lambda: get_clip_embeddings(crops, model, processor, batch_size=config.clip_batch_size), args.repeat, items=len(crops)
+        )
+
+        rng = np.random.default_rng(0)
+        catalog = rng.normal(size=(args.catalog_size, embeddings.shape[1])).astype(np.float32)
+        catalog /= np.linalg.norm(catalog, axis=1, keepdims=True)
+        product_ids = [str(i // 3) for i in range(args.catalog_size)]  # three shots per product, like catalog.csv
+        spec = IndexSpec(index_type=args.index_type)
+        index, stages["faiss_build"] = time_stage(lambda: build_catalog_index(catalog, spec=spec), 1, items=args.catalog_size)
+        catalog_index = CatalogIndex(index, product_ids, {})
+        _, stages["faiss_search"] = time_stage(
+            lambda: catalog_index.search_products(embeddings, top_k=1), args.repeat, items=len(embeddings)
+        )
+
+        if args.whisper is not None:
+            whisper_model = registry.get_whisper(args.whisper)
+            _, stages["transcribe"] = time_stage(
+                lambda: transcribe_audio(video_path, "bench_reel", workdir, model_size=args.whisper, model=whisper_model), args.repeat
+            )
+
+        with open(config.vibes_list_file, "r") as f:
+            vibes_list = json.load(f)
+        _, stages["vibes_local"] = time_stage(
+            lambda: vibe_classification_local(embeddings, vibes_list, clip_name, clip_model_and_processor=(model, processor)), args.repeat
+        )
+        server, base_url = start_mock_llm()
+        try:
+            client = LLMClient(base_url, api_key="bench", cache_size=0)
+            texts = ["#boho #summer", "golden hour picnic in a linen dress"]
+            _, stages["vibes_llm_mock"] = time_stage(lambda: groq_llm_vibes(texts, "bench", vibes_list, client=client), args.repeat)
+        finally:
+            server.shutdown()
+        results["model_load"] = registry.report()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(old_path, new_path, threshold=0.1):
+    """
+    Prints the median time of every stage in two result files and flags changes beyond threshold (a fraction).
+    Returns the number of stages that got slower by more than the threshold.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'stage':<16}{'old s':>10}{'new s':>10}{'change':>10}  ({old['meta'].get('commit')} -> {new['meta'].get('commit')})")
+    regressions = 0
+    for stage in sorted(set(old["stages"]) | set(new["stages"])):
+        before = old["stages"].get(stage, {}).get("median_seconds")
+        after = new["stages"].get(stage, {}).get("median_seconds")
+        if before is None or after is None:
+            print(f"{stage:<16}{before if before is not None else '-':>10}{after if after is not None else '-':>10}")
+            continue
+        change = (after - before) / before if before else 0.0
+        flag = " slower" if change > threshold else (" faster" if change < -threshold else "")
+        regressions += change > threshold
+        print(f"{stage:<16}{before:>10}{after:>10}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "compare":
+        parser = argparse.ArgumentParser(prog="pipeline_benchmark compare", description="Compare two benchmark result files.")
+        parser.add_argument("old")
+        parser.add_argument("new")
+        parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as slower/faster.")
+        args = parser.parse_args(argv[1:])
+        return 1 if compare(args.old, args.new, args.threshold) else 0
+
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the Flickd pipeline on a synthetic reel.")
+    parser.add_argument("--models", choices=("random", "pretrained"), default="random", help="Random-weight stubs or the configured models.")
+    parser.add_argument("--whisper", help="Whisper model size to time transcription with (e.g. tiny); skipped if not given.")
+    parser.add_argument("--seconds", type=float, default=10, help="Synthetic video length.")
+    parser.add_argument("--fps", type=int, default=30, help="Synthetic video frame rate.")
+    parser.add_argument("--width", type=int, default=720, help="Synthetic video width.")
+    parser.add_argument("--height", type=int, default=1280, help="Synthetic video height.")
+    parser.add_argument("--frame-rate", type=int, default=1, help="Frames sampled per second of video.")
+    parser.add_argument("--sampling-mode", choices=("grab", "seek", "scene"), default="grab", help="Frame sampling mode.")
+    parser.add_argument("--catalog-size", type=int, default=8000, help="Number of random catalog vectors to search.")
+    parser.add_argument("--index-type", choices=("flat", "ivf_flat", "hnsw", "ivf_pq"), default="flat", help="Catalog index type.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args)
+    print(f"{'stage':<16}{'median s':>10}{'min s':>10}{'ms/item':>10}")
+    for stage, timing in results["stages"].items():
+        print(f"{stage:<16}{timing['median_seconds']:>10}{timing['min_seconds']:>10}{timing.get('per_item_ms', '-'):>10}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
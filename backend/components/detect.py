@@ -1,11 +1,44 @@
 import os
 import re
-from ultralytics import YOLO
 from utils.logger import get_logger
+from utils.model_registry import get_model_registry
 
 logger = get_logger(__name__)
 
-def detect_fashion_items(frame_path, yolo_model_path="yolov8n.pt", conf=0.3):
+def _frame_number_from_path(frame_path):
+    match = re.search(r'frame_(\d+)', os.path.basename(frame_path))
+    return int(match.group(1)) if match else -1
+
+def _frame_source(frame):
+    """
+    Returns (YOLO input, frame_number, timestamp) for a frame given as a file path or a sample_frames dict.
+    """
+    if isinstance(frame, dict):
+        return frame["image"], frame["frame_number"], frame.get("timestamp")
+    return frame, _frame_number_from_path(frame), None
+
+def _result_to_detections(result, model, frame_number, timestamp=None):
+    """
+    Converts a single ultralytics result into the pipeline's detection dicts.
+    """
+    detections = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
+        w, h = x2 - x1, y2 - y1
+        conf_score = float(box.conf[0])
+        class_id = int(box.cls[0])
+        class_name = model.names[class_id] if hasattr(model, "names") else str(class_id)
+        detections.append({
+            "class_name": class_name,
+            "bbox": [x1, y1, w, h],
+            "confidence": conf_score,
+            "frame_number": frame_number
+        })
+        if timestamp is not None:
+            detections[-1]["timestamp"] = timestamp
+    return detections
+
+def detect_fashion_items(frame_path, yolo_model_path="yolov8n.pt", conf=0.3, model=None, save=False):
     """
     Detects fashion items in a single video frame using a YOLOv8 model.
 
@@ -13,6 +46,8 @@ def detect_fashion_items(frame_path, yolo_model_path="yolov8n.pt", conf=0.3):
         frame_path (str): Path to the video frame image (JPEG/PNG).
         yolo_model_path (str, optional): Path to the YOLOv8 model weights file. Defaults to "yolov8n.pt".
         conf (float, optional): Confidence threshold for detections. Defaults to 0.3.
+        model (ultralytics.YOLO, optional): Preloaded YOLO model. If None, the shared model for yolo_model_path is taken from the model registry.
+        save (bool, optional): Save an annotated copy of the frame under runs/ for debugging. Defaults to False.
 
     Returns:
         list[dict]: List of detections, each as a dict with keys:
@@ -26,29 +61,55 @@ def detect_fashion_items(frame_path, yolo_model_path="yolov8n.pt", conf=0.3):
 
     logger.info(f"Detecting fashion items in frame: {frame_path} with model: {yolo_model_path}...")
 
-    match = re.search(r'frame_(\d+)', os.path.basename(frame_path))
-    frame_number = int(match.group(1)) if match else -1
-    
+    frame_number = _frame_number_from_path(frame_path)
+
     try:
-        model = YOLO(yolo_model_path)
-        results = model.predict(frame_path, save=True, conf=conf)
+        if model is None:
+            model = get_model_registry().get_yolo(yolo_model_path)
+        results = model.predict(frame_path, save=save, conf=conf, verbose=False)
         detections = []
         for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                w, h = x2 - x1, y2 - y1
-                conf_score = float(box.conf[0])
-                class_id = int(box.cls[0])
-                class_name = model.names[class_id] if hasattr(model, "names") else str(class_id)
-                detections.append({
-                    "class_name": class_name,
-                    "bbox": [x1, y1, w, h],
-                    "confidence": conf_score,
-                    "frame_number": frame_number
-                })
-        logger.info(f"Detected {len(boxes)} items in frame {frame_number}.")
+            detections.extend(_result_to_detections(result, model, frame_number))
+        logger.info(f"Detected {len(detections)} items in frame {frame_number}.")
         return detections
     except Exception as e:
         logger.error(f"Detection failed for frame {frame_path}: {e}", exc_info=True)
-        return []
\ No newline at end of file
+        return []
+
+def detect_fashion_items_batch(frames, yolo_model_path="yolov8n.pt", conf=0.3, batch_size=16, model=None, save=False):
+    """
+    Detects fashion items in many video frames, running them through YOLO in batches.
+
+    Args:
+        frames (list[str] or list[dict]): Paths to the video frame images (JPEG/PNG), or in-memory
+            frames from sample_frames (dicts with frame_number and a BGR image array).
+        yolo_model_path (str, optional): Path to the YOLOv8 model weights file. Defaults to "yolov8n.pt".
+        conf (float, optional): Confidence threshold for detections. Defaults to 0.3.
+        batch_size (int, optional): Number of frames per YOLO forward pass. Defaults to 16.
+        model (ultralytics.YOLO, optional): Preloaded YOLO model. If None, the shared model for yolo_model_path is taken from the model registry.
+        save (bool, optional): Save annotated copies of the frames under runs/ for debugging. Defaults to False.
+
+    Returns:
+        list[list[dict]]: Detections per frame, in the same order as frames (see detect_fashion_items for the dict keys).
+            Detections from in-memory frames also carry the frame's timestamp (seconds).
+
+    Logs detection progress and errors. A batch that fails yields empty detection lists for its frames.
+    """
+    logger.info(f"Detecting fashion items in {len(frames)} frames with model: {yolo_model_path} (batch size {batch_size})...")
+    if model is None:
+        model = get_model_registry().get_yolo(yolo_model_path)
+    batch_size = max(1, int(batch_size))
+
+    per_frame_detections = []
+    for start in range(0, len(frames), batch_size):
+        sources, frame_numbers, timestamps = zip(*(_frame_source(frame) for frame in frames[start:start + batch_size]))
+        try:
+            results = model.predict(list(sources), save=save, conf=conf, batch=len(sources), verbose=False)
+            for frame_number, timestamp, result in zip(frame_numbers, timestamps, results):
+                per_frame_detections.append(_result_to_detections(result, model, frame_number, timestamp))
+        except Exception as e:
+            logger.error(f"Detection failed for frames {frame_numbers[0]}..{frame_numbers[-1]}: {e}", exc_info=True)
+            per_frame_detections.extend([] for _ in sources)
+    total = sum(len(d) for d in per_frame_detections)
+    logger.info(f"Detected {total} items across {len(frames)} frames.")
+    return per_frame_detections
@@ -4,52 +4,153 @@ from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def extract_frames(video_id, video_capture, output_dir, frame_rate=1):
+SAMPLING_MODES = ("grab", "seek", "scene")
+
+def _frame_signature(frame):
     """
-    Extracts frames from a video at the specified frame rate (frames per second).
-    Saves frames as JPEGs in output_dir/<video_id>/.
+    Returns a small normalized HSV histogram used to compare frames for scene changes.
+    """
+    small = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+def sample_frames(video_id, video_capture, frame_rate=1, mode="grab", scene_threshold=0.3, on_frame=None):
+    """
+    Samples frames from a video and keeps them in memory.
+
+    Modes:
+        - "grab": walks the stream with cap.grab() and only retrieves (converts and copies)
+          one frame every fps / frame_rate frames.
+        - "seek": jumps straight to each wanted frame with CAP_PROP_POS_FRAMES. Cheaper than
+          "grab" when frames are sampled far apart relative to the keyframe interval.
+        - "scene": samples candidates like "grab", but only keeps a candidate when it differs
+          from the last kept frame by more than scene_threshold (HSV histogram distance), so
+          static shots yield a single frame.
 
     Args:
-        video_id (str): Unique identifier for the video (used as output folder name).
+        video_id (str): Unique identifier for the video (used for logging).
         video_capture (cv2.VideoCapture): OpenCV VideoCapture object for the video.
-        output_dir (str): Directory where extracted frames will be saved.
         frame_rate (int, optional): Number of frames to extract per second. Defaults to 1.
+        mode (str, optional): One of "grab", "seek" or "scene". Defaults to "grab".
+        scene_threshold (float, optional): Bhattacharyya distance above which a candidate counts
+            as a new scene in "scene" mode. Defaults to 0.3.
+        on_frame (callable, optional): Called with each frame dict as soon as it is sampled.
 
     Returns:
-        list[str]: List of file paths to the extracted frame images.
+        list[dict]: Sampled frames, each as a dict with keys:
+            - frame_number (int): Index of the sampled frame (0, 1, 2, ...).
+            - timestamp (float): Position of the frame in the video, in seconds.
+            - image (np.ndarray): Decoded BGR frame.
 
     Logs extraction progress and errors. Returns an empty list if extraction fails.
     """
     try:
-        logger.info(f"Extracting frames from {video_id} at {frame_rate} fps...")
-
-        save_dir = os.path.join(output_dir, video_id)
-        os.makedirs(save_dir, exist_ok=True)
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}', expected one of {SAMPLING_MODES}")
+        logger.info(f"Sampling frames from {video_id} at {frame_rate} fps (mode: {mode})...")
 
         cap = video_capture
         fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(fps / frame_rate) if fps > 0 else 1
+        frame_interval = max(1, int(fps / frame_rate)) if fps > 0 else 1
 
-        frame_paths = []
-        frame_idx = 0
-        saved_idx = 0
+        def timestamp_of(frame_idx):
+            if fps > 0:
+                return round(frame_idx / fps, 3)
+            return round(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, 3)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        frames = []
+        last_signature = None
+        decoded = 0
 
-            if frame_idx % frame_interval == 0:
-                frame_file = os.path.join(save_dir, f"frame_{saved_idx:04d}.jpg")
-                cv2.imwrite(frame_file, frame)
-                frame_paths.append(frame_file)
-                saved_idx += 1
-            frame_idx += 1
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if mode == "seek" and total_frames <= 0:
+            logger.warning(f"Frame count unknown for {video_id}; falling back to grab sampling.")
+            mode = "grab"
+
+        if mode == "seek":
+            for frame_idx in range(0, total_frames, frame_interval):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                decoded += 1
+                frames.append({"frame_number": len(frames), "timestamp": timestamp_of(frame_idx), "image": frame})
+                if on_frame:
+                    on_frame(frames[-1])
+        else:
+            frame_idx = 0
+            while cap.grab():
+                if frame_idx % frame_interval == 0:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    decoded += 1
+                    keep = True
+                    if mode == "scene":
+                        signature = _frame_signature(frame)
+                        if last_signature is not None:
+                            distance = cv2.compareHist(last_signature, signature, cv2.HISTCMP_BHATTACHARYYA)
+                            keep = distance > scene_threshold
+                        if keep:
+                            last_signature = signature
+                    if keep:
+                        frames.append({"frame_number": len(frames), "timestamp": timestamp_of(frame_idx), "image": frame})
+                        if on_frame:
+                            on_frame(frames[-1])
+                frame_idx += 1
 
         cap.release()
-        logger.info(f"Extracted {len(frame_paths)} frames from {video_id} to {save_dir}.")
+        logger.info(f"Sampled {len(frames)} frames from {video_id} ({decoded} retrieved).")
+        return frames
+    except Exception as e:
+        logger.error(f"Frame sampling failed for video {video_id}: {e}", exc_info=True)
+        return []
+
+def save_frames(video_id, frames, output_dir):
+    """
+    Saves sampled frames as JPEGs in output_dir/<video_id>/ and records each file path on its frame dict.
+
+    Args:
+        video_id (str): Unique identifier for the video (used as output folder name).
+        frames (list[dict]): Frames returned by sample_frames.
+        output_dir (str): Directory where extracted frames will be saved.
+
+    Returns:
+        list[str]: List of file paths to the saved frame images.
+
+    Logs saving progress and errors. Returns an empty list if saving fails.
+    """
+    try:
+        save_dir = os.path.join(output_dir, video_id)
+        os.makedirs(save_dir, exist_ok=True)
+        frame_paths = []
+        for frame in frames:
+            frame_file = os.path.join(save_dir, f"frame_{frame['frame_number']:04d}.jpg")
+            cv2.imwrite(frame_file, frame["image"])
+            frame["path"] = frame_file
+            frame_paths.append(frame_file)
+        logger.info(f"Saved {len(frame_paths)} frames from {video_id} to {save_dir}.")
         return frame_paths
     except Exception as e:
-        logger.error(f"Frame extraction failed for video {video_id}: {e}", exc_info=True)
+        logger.error(f"Saving frames failed for video {video_id}: {e}", exc_info=True)
         return []
 
+def extract_frames(video_id, video_capture, output_dir, frame_rate=1):
+    """
+    Extracts frames from a video at the specified frame rate (frames per second).
+    Saves frames as JPEGs in output_dir/<video_id>/.
+
+    Args:
+        video_id (str): Unique identifier for the video (used as output folder name).
+        video_capture (cv2.VideoCapture): OpenCV VideoCapture object for the video.
+        output_dir (str): Directory where extracted frames will be saved.
+        frame_rate (int, optional): Number of frames to extract per second. Defaults to 1.
+
+    Returns:
+        list[str]: List of file paths to the extracted frame images.
+
+    Logs extraction progress and errors. Returns an empty list if extraction fails.
+    """
+    frames = sample_frames(video_id, video_capture, frame_rate)
+    return save_frames(video_id, frames, output_dir)
@@ -1,36 +1,78 @@
-import pandas as pd
-import faiss
-from utils.crop import crop_to_pil
-from utils.extract_catalog_embeddings import get_clip_embedding, get_clip_processor_and_model
+import numpy as np
+from utils.crop import crop_to_pil, crop_array_to_pil
+from utils.extract_catalog_embeddings import get_clip_embeddings
+from utils.model_registry import get_model_registry
+from utils.embedding_cache import dhash
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def load_meta(catalog_csv: pd.DataFrame):
-    meta = {}
-    for _, row in catalog_csv.iterrows():
-        pid = str(row['id'])
-        # Only keep the first occurrence (first shot angle) for each product_id
-        if pid not in meta:
-            meta[pid] = {
-                'title': row['title'],
-                'category': row['category'],
-                'color': row['color'],
-                'image_url': row['image_url']
-            }
-    return meta
+def _hits_to_matches(scores, indices, catalog_index):
+    """
+    Converts one row of FAISS search results into match dicts, dropping hits below the similarity threshold.
+    """
+    matches = []
+    for score, idx in zip(scores, indices):
+        if idx < 0:
+            continue
+        product_id = catalog_index.product_ids[idx]
+        meta = catalog_index.meta.get(str(product_id), {})
+        if score < 0.75:
+            continue
+        match_type = (
+            "exact" if score > 0.9 else
+            "similar"
+        )
+        matches.append({
+            "matched_product_id": product_id,
+            "match_type": match_type,
+            "confidence": round(float(score), 3),
+            "type": meta.get("category", None),
+            "color": meta.get("color", None),
+            "title": meta.get("title", None),
+            "image_url": meta.get("image_url", None)
+        })
+    return matches
 
+def _embed_crops(crops, clip_model, clip_model_and_processor, batch_size=32, embedding_cache=None, embed_fn=None):
+    """
+    Returns the (N, D) CLIP embeddings of crops, taking those already in embedding_cache from
+    it and running CLIP (or embed_fn, if given) only on the rest. The CLIP model is only loaded
+    if something is missing.
+    """
+    hashes = [dhash(crop) for crop in crops] if embedding_cache is not None else None
+    cached = embedding_cache.get_many(clip_model, hashes) if embedding_cache is not None else {}
+    missing = [i for i in range(len(crops)) if hashes is None or hashes[i] not in cached]
+    computed = {}
+    if missing and embed_fn is not None:
+        embeddings = embed_fn([crops[i] for i in missing])
+    elif missing:
+        if clip_model_and_processor is None:
+            clip_model_and_processor = get_model_registry().get_clip(clip_model)
+        model, clip_processor = clip_model_and_processor
+        embeddings = get_clip_embeddings([crops[i] for i in missing], model, clip_processor, batch_size=batch_size)
+    if missing:
+        computed = dict(zip(missing, embeddings))
+        if embedding_cache is not None:
+            embedding_cache.put_many(clip_model, [(hashes[i], computed[i]) for i in missing])
+    if embedding_cache is not None:
+        logger.info(f"Crop embedding cache: {len(crops) - len(missing)} hits, {len(missing)} misses.")
+    return np.stack([computed[i] if i in computed else cached[hashes[i]] for i in range(len(crops))]).astype(np.float32)
 
-def match_product(detection, frame_file, catalog_embeddings, catalog_products_id, catalog_csv, clip_model, top_k=1):
+def match_product(detection, frame_file, catalog_index, clip_model, top_k=1, clip_model_and_processor=None, pooling="max", overfetch=4,
+                  embedding_cache=None):
     """
     Match a detected fashion item with the catalog embeddings.
     Args:
         detection (dict): A single detection containing class_name, bbox, confidence, and frame_number.
         frame_file (str): Path to the frame image.
-        catalog_embeddings (numpy): Catalog embeddings loaded from a file.
-        catalog_products_id (list): List of product IDs corresponding to the catalog embeddings.
-        catalog_csv (pd.DataFrame): Catalog dataframe
-        top_k (int): Number of top matches to return.
+        catalog_index (CatalogIndex): Shared FAISS index over the catalog embeddings with product IDs and metadata.
+        clip_model (str): Name of the CLIP model used for the catalog embeddings.
+        top_k (int): Number of distinct products to return.
+        clip_model_and_processor (tuple, optional): Preloaded (CLIPModel, CLIPProcessor). If None, the shared pair for clip_model is taken from the model registry.
+        pooling (str): How the scores of a product's catalog shots are combined, "max" or "mean".
+        overfetch (int): Extra catalog vectors fetched per wanted product before aggregating.
+        embedding_cache (CropEmbeddingCache, optional): Cache of crop embeddings consulted before running CLIP.
     Returns:
         list: Top K matched products with their IDs and similarity scores.
     Logs matching progress and errors. Returns an empty list if matching fails.
@@ -38,38 +80,114 @@ def match_product(detection, frame_file, catalog_embeddings, catalog_products_id
     try:
         logger.info(f"Matching products from catalog with detections items from {frame_file}...")
         cropped_image = crop_to_pil(frame_file, detection["bbox"])
-        model, clip_processor = get_clip_processor_and_model(clip_model)
-        cropped_image_embeddings = get_clip_embedding(cropped_image, model, clip_processor)
-        cropped_image_embeddings = cropped_image_embeddings.reshape(1, -1)
-
-        # Build FAISS index
-        faiss_index = faiss.IndexFlatIP(catalog_embeddings.shape[1])
-        faiss_index.add(catalog_embeddings)
-
-        catalog_meta = load_meta(catalog_csv)
+        cropped_image_embeddings = _embed_crops([cropped_image], clip_model, clip_model_and_processor, embedding_cache=embedding_cache)
 
-        D, I = faiss_index.search(cropped_image_embeddings, top_k)
-        matches = []
-        for score, idx in zip(D[0], I[0]):
-            product_id = catalog_products_id[idx]
-            meta = catalog_meta.get(str(product_id), {})
-            if score < 0.75:
-                continue
-            match_type = (
-                "exact" if score > 0.9 else
-                "similar"
-            )
-            matches.append({
-                "matched_product_id": product_id,
-                "match_type": match_type,
-                "confidence": round(float(score), 3),
-                "type": meta.get("category", None),
-                "color": meta.get("color", None),
-                "title": meta.get("title", None),
-                "image_url": meta.get("image_url", None)
-            })
+        D, I = catalog_index.search_products(cropped_image_embeddings, top_k, pooling=pooling, overfetch=overfetch)
+        matches = _hits_to_matches(D[0], I[0], catalog_index)
         logger.info(f"{len(matches)} items got matched with the {frame_file}")
         return matches
     except Exception as e:
         logger.error(f"Product matching failed for frame {frame_file}: {e}", exc_info=True)
-        return []
\ No newline at end of file
+        return []
+
+def _crop_detection(frame, bbox):
+    """
+    Crops a detection from a frame given as a file path or an in-memory sample_frames dict.
+    """
+    if isinstance(frame, dict):
+        return crop_array_to_pil(frame["image"], bbox)
+    return crop_to_pil(frame, bbox)
+
+def _search_by_category(detections, positions, crop_embeddings, catalog_index, top_k, pooling, overfetch,
+                        class_categories, category_fallback):
+    """
+    Searches each crop within the catalog categories of its detection's class and returns
+    {position: matches}. Crops of unmapped classes, or whose category search finds nothing
+    above the threshold, are searched against the whole catalog when category_fallback is set.
+    """
+    groups = {}
+    fallback_rows = []
+    for row, position in enumerate(positions):
+        class_name = str(detections[position].get("class_name", "")).lower()
+        categories = class_categories.get(class_name)
+        if categories is None:
+            if category_fallback:
+                fallback_rows.append(row)
+        elif categories:
+            groups.setdefault(tuple(sorted(categories)), []).append(row)
+    results = {}
+    for categories, rows in groups.items():
+        D, I = catalog_index.search_products(crop_embeddings[rows], top_k, pooling=pooling, overfetch=overfetch, categories=categories)
+        for i, row in enumerate(rows):
+            matches = _hits_to_matches(D[i], I[i], catalog_index)
+            if matches:
+                results[positions[row]] = matches
+            elif category_fallback:
+                fallback_rows.append(row)
+    if fallback_rows:
+        D, I = catalog_index.search_products(crop_embeddings[fallback_rows], top_k, pooling=pooling, overfetch=overfetch)
+        for i, row in enumerate(fallback_rows):
+            results[positions[row]] = _hits_to_matches(D[i], I[i], catalog_index)
+    return results
+
+def match_products(detections, frames, catalog_index, clip_model, top_k=1, clip_model_and_processor=None, batch_size=32,
+                   pooling="max", overfetch=4, class_categories=None, category_fallback=True, embedding_cache=None,
+                   return_embeddings=False, embed_fn=None):
+    """
+    Match many detected fashion items with the catalog embeddings at once.
+    All crops are embedded in CLIP batches and searched with a single FAISS query matrix.
+    Args:
+        detections (list[dict]): Detections, each containing class_name, bbox, confidence, and frame_number.
+        frames (list[str] or list[dict]): Frame of each detection, as an image path or an in-memory sample_frames dict.
+        catalog_index (CatalogIndex): Shared FAISS index over the catalog embeddings with product IDs and metadata.
+        clip_model (str): Name of the CLIP model used for the catalog embeddings.
+        top_k (int): Number of distinct products to return per detection.
+        clip_model_and_processor (tuple, optional): Preloaded (CLIPModel, CLIPProcessor). If None, the shared pair for clip_model is taken from the model registry.
+        batch_size (int): Maximum number of crops per CLIP forward pass.
+        pooling (str): How the scores of a product's catalog shots are combined, "max" or "mean".
+        overfetch (int): Extra catalog vectors fetched per wanted product before aggregating.
+        class_categories (dict, optional): Maps YOLO class names to the catalog categories to search. If None, every detection is searched against the whole catalog.
+        category_fallback (bool): Search the whole catalog for unmapped classes and for detections without a match in their categories.
+        embedding_cache (CropEmbeddingCache, optional): Cache of crop embeddings consulted before running CLIP.
+        return_embeddings (bool): Also return the CLIP embeddings of the crops, e.g. for local vibe classification.
+        embed_fn (callable, optional): Maps a list of PIL crops to an (N, D) array of normalized embeddings, used instead of calling CLIP directly (e.g. a batcher shared between videos).
+    Returns:
+        list[list]: Matched products for each detection, in the same order as detections.
+            With return_embeddings, a tuple (matches, embeddings) where embeddings is an (M, D)
+            array for the M detections that could be cropped, or None if none could.
+    Logs matching progress and errors. Returns empty lists if matching fails.
+    """
+    results = [[] for _ in detections]
+    crop_embeddings = None
+
+    def done():
+        return (results, crop_embeddings) if return_embeddings else results
+
+    if not detections:
+        return done()
+    try:
+        logger.info(f"Matching {len(detections)} detections against the catalog...")
+        crops = []
+        positions = []
+        for i, (detection, frame) in enumerate(zip(detections, frames)):
+            cropped_image = _crop_detection(frame, detection["bbox"])
+            if cropped_image is not None:
+                crops.append(cropped_image)
+                positions.append(i)
+        if not crops:
+            return done()
+        crop_embeddings = _embed_crops(crops, clip_model, clip_model_and_processor, batch_size, embedding_cache, embed_fn)
+
+        if class_categories is not None:
+            for position, matches in _search_by_category(detections, positions, crop_embeddings, catalog_index, top_k, pooling,
+                                                          overfetch, class_categories, category_fallback).items():
+                results[position] = matches
+        else:
+            D, I = catalog_index.search_products(crop_embeddings, top_k, pooling=pooling, overfetch=overfetch)
+            for row, position in enumerate(positions):
+                results[position] = _hits_to_matches(D[row], I[row], catalog_index)
+        logger.info(f"{sum(len(m) for m in results)} items got matched from {len(detections)} detections")
+        return done()
+    except Exception as e:
+        logger.error(f"Batched product matching failed: {e}", exc_info=True)
+        return done()
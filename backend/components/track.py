@@ -0,0 +1,127 @@
+import math
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def _iou(a, b):
+    """
+    Returns the intersection over union of two [x, y, w, h] boxes.
+    """
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+def _centroid_distance(a, b):
+    """
+    Returns the distance between the centres of two [x, y, w, h] boxes, relative to the diagonal of the larger box.
+    """
+    dx = (a[0] + a[2] / 2) - (b[0] + b[2] / 2)
+    dy = (a[1] + a[3] / 2) - (b[1] + b[3] / 2)
+    diagonal = max(math.hypot(a[2], a[3]), math.hypot(b[2], b[3]), 1.0)
+    return math.hypot(dx, dy) / diagonal
+
+def _crop_score(detection):
+    # Prefer confident, large crops: they carry the most garment detail for CLIP
+    _, _, w, h = detection["bbox"]
+    return detection["confidence"] * math.sqrt(max(w, 0) * max(h, 0))
+
+def track_detections(per_frame_detections, iou_threshold=0.3, max_centroid_distance=0.5, max_gap=2):
+    """
+    Groups detections across sampled frames into tracks of the same garment.
+
+    Frames are processed in order. Each detection is associated with an active track of the
+    same class, greedily by IoU with the track's last box; when no box overlaps by at least
+    iou_threshold, a track whose last box centre lies within max_centroid_distance (relative to
+    the box diagonal) is used instead. Tracks not extended for more than max_gap sampled frames
+    are closed. Unassociated detections start new tracks.
+
+    Args:
+        per_frame_detections (list[list[dict]]): Detections of each sampled frame, in frame order.
+        iou_threshold (float, optional): Minimum IoU for an association. Defaults to 0.3.
+        max_centroid_distance (float, optional): Maximum relative centre distance for the fallback association. Defaults to 0.5.
+        max_gap (int, optional): Number of sampled frames a track may go unseen. Defaults to 2.
+
+    Returns:
+        list[dict]: Tracks, each with track_id, class_name and members, a list of
+            (frame_index, detection_index) pairs in frame order.
+    """
+    tracks = []
+    active = []
+    for frame_index, detections in enumerate(per_frame_detections):
+        active = [t for t in active if frame_index - t["last_frame_index"] <= max_gap + 1]
+        candidates = []
+        for det_index, detection in enumerate(detections):
+            for track in active:
+                if track["class_name"] != detection["class_name"]:
+                    continue
+                iou = _iou(track["last_bbox"], detection["bbox"])
+                if iou >= iou_threshold:
+                    candidates.append((1.0 + iou, det_index, track))
+                else:
+                    distance = _centroid_distance(track["last_bbox"], detection["bbox"])
+                    if distance <= max_centroid_distance:
+                        candidates.append((1.0 - distance, det_index, track))
+        assigned_detections = set()
+        assigned_tracks = set()
+        for _, det_index, track in sorted(candidates, key=lambda c: c[0], reverse=True):
+            if det_index in assigned_detections or track["track_id"] in assigned_tracks:
+                continue
+            assigned_detections.add(det_index)
+            assigned_tracks.add(track["track_id"])
+            track["members"].append((frame_index, det_index))
+            track["last_bbox"] = detections[det_index]["bbox"]
+            track["last_frame_index"] = frame_index
+        for det_index, detection in enumerate(detections):
+            if det_index in assigned_detections:
+                continue
+            track = {
+                "track_id": len(tracks),
+                "class_name": detection["class_name"],
+                "members": [(frame_index, det_index)],
+                "last_bbox": detection["bbox"],
+                "last_frame_index": frame_index,
+            }
+            tracks.append(track)
+            active.append(track)
+    for track in tracks:
+        del track["last_bbox"], track["last_frame_index"]
+    logger.info(f"Grouped {sum(len(d) for d in per_frame_detections)} detections into {len(tracks)} tracks.")
+    return tracks
+
+def best_track_members(track, per_frame_detections, max_crops=1):
+    """
+    Returns up to max_crops (frame_index, detection_index) members of a track with the best crops, best first.
+    """
+    return sorted(
+        track["members"],
+        key=lambda m: _crop_score(per_frame_detections[m[0]][m[1]]),
+        reverse=True
+    )[:max_crops]
+
+def track_summary(track, frames):
+    """
+    Summarizes where a track appears in the video.
+
+    Args:
+        track (dict): A track from track_detections.
+        frames (list[dict]): The sampled frames the detections came from, in the same order.
+
+    Returns:
+        dict: track_length (number of sampled frames the garment was seen in) and frame_ranges,
+            a list of [first_frame_number, last_frame_number] runs over consecutive sampled frames.
+    """
+    frame_indexes = sorted({frame_index for frame_index, _ in track["members"]})
+    ranges = []
+    for frame_index in frame_indexes:
+        if ranges and frame_index == ranges[-1][1] + 1:
+            ranges[-1][1] = frame_index
+        else:
+            ranges.append([frame_index, frame_index])
+    return {
+        "track_length": len(frame_indexes),
+        "frame_ranges": [[frames[start]["frame_number"], frames[end]["frame_number"]] for start, end in ranges],
+    }
@@ -1,21 +1,25 @@
 import os
-import whisper
 from utils.logger import get_logger
-from moviepy import VideoFileClip
-import tempfile
+from utils.model_registry import get_model_registry
+from utils.audio import load_audio_array, is_silent
 
 logger = get_logger(__name__)
 
-def transcribe_audio(video_file: tempfile._TemporaryFileWrapper, video_id, output_dir, model_size="base") -> str:
+def transcribe_audio(video_path: str, video_id, output_dir, model_size="base", model=None) -> str:
     """
     Extracts audio from a video file and generates a transcript using Whisper.
     Saves transcript as a .txt file in output_dir/<video_id>_transcript.txt.
+    The audio track is decoded straight into memory; no intermediate audio file is written.
+    Videos without an audio track, or with only silence, get an empty transcript without running Whisper.
+    The video file itself is left in place; its owner is responsible for cleaning it up.
 
     Args:
-        video_file (tempfile._TemporaryFileWrapper): Temporary file object for the input video.
+        video_path (str): Path to the input video.
         video_id (str): Unique identifier for the video (used for output filename).
         output_dir (str): Directory where the transcript will be saved.
         model_size (str, optional): Size of the Whisper model to use (e.g., "tiny", "base", "small", "medium", "large-v3"). Defaults to "base".
+        model (SerializedWhisper, optional): Preloaded Whisper model. If None, the shared model for model_size is taken from the model registry.
+            Concurrent callers must share a registry model, whose transcribe calls are serialized; a bare whisper.Whisper is not thread-safe.
 
     Returns:
         str or None: Path to the transcript file if successful, None if transcription fails.
@@ -23,22 +27,22 @@ def transcribe_audio(video_file: tempfile._TemporaryFileWrapper, video_id, outpu
     Logs transcription progress and errors. Returns None if transcription fails.
     """
     try:
-        model = whisper.load_model(model_size)
         os.makedirs(output_dir, exist_ok=True)
         transcript_path = os.path.join(output_dir, f"{video_id}_transcript.txt")
 
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio_file:
-            logger.info(f"Transcribing audio from {video_id}...")
-            clip = VideoFileClip(video_file.name)
-            clip.audio.write_audiofile(temp_audio_file.name)
-            temp_audio_file.flush()
-            result = model.transcribe(temp_audio_file.name, language="en", verbose=False)
-            with open(transcript_path, 'w', encoding='utf-8') as f:
-                f.write(result['text'])
-            logger.info(f"Transcript saved to {transcript_path}.")
-        os.remove(temp_audio_file.name)
-        video_file.close()
-        os.remove(video_file.name)
+        logger.info(f"Transcribing audio from {video_id}...")
+        audio = load_audio_array(video_path)
+        if audio is None or is_silent(audio):
+            logger.info(f"No audible audio in {video_id}; skipping transcription.")
+            text = ""
+        else:
+            if model is None:
+                model = get_model_registry().get_whisper(model_size)
+            result = model.transcribe(audio, language="en", verbose=False)
+            text = result['text']
+        with open(transcript_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.info(f"Transcript saved to {transcript_path}.")
         return transcript_path
     except Exception as e:
         logger.error(f"Failed to transcribe {video_id}: {e}", exc_info=True)
@@ -1,59 +1,80 @@
-import requests
 import ast
 import os
+import hashlib
+import threading
+from functools import lru_cache
+import numpy as np
 from utils.logger import get_logger
+from utils.model_registry import get_model_registry
+from utils.llm_client import get_llm_client, response_cache_key
+from config import LLM_BASE_URL, LLM_MODEL
 
 logger = get_logger(__name__)
 
-def groq_llm_vibes(texts, groq_api_key, vibes_list):
-
-    vibes_desc = [
-        ("Coquette", "Feminine, flirty, often featuring bows, lace, soft makeup, and romantic details."),
-        ("Clean Girl", "Minimalist and polished look with slicked-back hair, gold jewelry, and natural makeup."),
-        ("Cottagecore", "Pastoral, vintage-inspired, with florals, prairie dresses, and an earthy aesthetic."),
-        ("Streetcore", "Urban and edgy, with oversized fits, sneakers, graphic tees, and streetwear brands."),
-        ("Y2K", "Early 2000s fashion with shiny fabrics, low-rise jeans, baby tees, and retro tech accessories."),
-        ("Boho", "Bohemian and free-spirited with layered textures, fringe, earthy tones, and eclectic prints."),
-        ("Party Glam", "Bold, sparkly, nightlife-ready fashion with statement pieces, heels, and dramatic makeup."),
-    ]
-    vibe_names = [name for name, desc in vibes_desc]
-    vibe_descriptions = "\n".join([f"- **{name}**: {desc}" for name, desc in vibes_desc])
-
-    # Load prompt template from file
+VIBES_DESC = [
+    ("Coquette", "Feminine, flirty, often featuring bows, lace, soft makeup, and romantic details."),
+    ("Clean Girl", "Minimalist and polished look with slicked-back hair, gold jewelry, and natural makeup."),
+    ("Cottagecore", "Pastoral, vintage-inspired, with florals, prairie dresses, and an earthy aesthetic."),
+    ("Streetcore", "Urban and edgy, with oversized fits, sneakers, graphic tees, and streetwear brands."),
+    ("Y2K", "Early 2000s fashion with shiny fabrics, low-rise jeans, baby tees, and retro tech accessories."),
+    ("Boho", "Bohemian and free-spirited with layered textures, fringe, earthy tones, and eclectic prints."),
+    ("Party Glam", "Bold, sparkly, nightlife-ready fashion with statement pieces, heels, and dramatic makeup."),
+]
+
+TEXTS_PLACEHOLDER = "{texts}"
+
+@lru_cache(maxsize=1)
+def vibe_prompt_template():
+    """
+    Returns the vibe prompt with the vibe names and descriptions filled in, read from
+    vibe_prompt.txt once per process. Only the {texts} placeholder is left to substitute.
+
+    Returns:
+        tuple: (template str, short hash of the template used to version cached responses).
+    """
     prompt_path = os.path.join(os.path.dirname(__file__), "vibe_prompt.txt")
     with open(prompt_path, "r", encoding="utf-8") as f:
         prompt_template = f.read()
+    template = prompt_template.format(
+        vibe_names=", ".join(name for name, _ in VIBES_DESC),
+        vibe_descriptions="\n".join(f"- **{name}**: {desc}" for name, desc in VIBES_DESC),
+        texts=TEXTS_PLACEHOLDER
+    )
+    return template, hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+def groq_llm_vibes(texts, groq_api_key, vibes_list, client=None):
+    """
+    Asks the LLM which vibes from VIBES_DESC fit the given texts.
 
-    prompt = prompt_template.format(
-        vibe_names=", ".join(vibe_names),
-        vibe_descriptions=vibe_descriptions,
-        texts="\n".join(texts)
+    Args:
+        texts (list[str]): Hashtags, caption and transcript lines.
+        groq_api_key (str): API key for the LLM endpoint.
+        vibes_list (list[str]): Vibe names accepted in the result.
+        client (LLMClient, optional): Client to use. Defaults to the shared client for LLM_BASE_URL and LLM_MODEL.
+
+    Returns:
+        list[str]: Lower-cased vibes from the LLM response that are in vibes_list.
+
+    Raises exception if the request fails after retries. Responses are cached per normalized texts and model.
+    """
+    client = client or get_llm_client(LLM_BASE_URL, groq_api_key, LLM_MODEL)
+    template, template_version = vibe_prompt_template()
+    prompt = template.replace(TEXTS_PLACEHOLDER, "\n".join(texts))
+    content = client.chat(
+        [{"role": "user", "content": prompt}],
+        max_tokens=50,
+        temperature=0.2,
+        cache_key=response_cache_key(client.model, texts, template_version)
     )
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": "llama3-8b-8192",  # or another Groq-supported model
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 50,
-        "temperature": 0.2,
-    }
-    response = requests.post(url, headers=headers, json=data)
-    llm_vibes = []
-    if response.ok:
-        result = response.json()
-        content = result["choices"][0]["message"]["content"]
-        logger.info(f"Groq LLM response: {content}")
-        try:
-            llm_vibes = ast.literal_eval(content)
-            if not isinstance(llm_vibes, list):
-                llm_vibes = []
-        except Exception as e:
-            logger.error(f"Failed to parse LLM vibes: {e}")
+    logger.info(f"Groq LLM response: {content}")
+    try:
+        llm_vibes = ast.literal_eval(content)
+        if not isinstance(llm_vibes, list):
             llm_vibes = []
-        logger.info(f"LLM vibes extracted: {llm_vibes}")
+    except Exception as e:
+        logger.error(f"Failed to parse LLM vibes: {e}")
+        llm_vibes = []
+    logger.info(f"LLM vibes extracted: {llm_vibes}")
     return [v.lower() for v in llm_vibes if v in vibes_list]
 
 def vibe_classification(hashtags, caption, audio_transcript, vibes_list, groq_api_key=None, detections=None):
@@ -99,6 +120,10 @@ def vibe_classification(hashtags, caption, audio_transcript, vibes_list, groq_ap
         logger.error(f"Error preparing input texts for vibe classification: {e}", exc_info=True)
         return []
 
+    if not any(str(text).strip() for text in texts):
+        logger.info("No hashtags, caption or transcript text. Returning empty vibes list.")
+        return []
+
     llm_vibes_list = []
     if groq_api_key:
         try:
@@ -110,9 +135,43 @@ def vibe_classification(hashtags, caption, audio_transcript, vibes_list, groq_ap
     logger.info(f"Vibes classified: {llm_vibes_list}")
     return list(llm_vibes_list)
 
+def _join_texts(hashtags, caption, audio_transcript):
+    text = caption or ""
+    if audio_transcript:
+        if isinstance(audio_transcript, list):
+            text += "\n" + " ".join(audio_transcript)
+        else:
+            text += "\n" + audio_transcript
+    if hashtags:
+        if isinstance(hashtags, list):
+            text += "\n" + " ".join(hashtags)
+        else:
+            text += "\n" + hashtags
+    return text
+
+def text_vibe_scores(text, vibes_list, model_name="facebook/bart-large-mnli", classifier=None):
+    """
+    Scores each vibe against text with a zero-shot text classifier (multi-label).
+
+    Args:
+        text (str): Caption, transcript and hashtags joined together.
+        vibes_list (list[str]): Vibe names to score.
+        model_name (str): HuggingFace model for zero-shot-classification.
+        classifier (transformers.Pipeline, optional): Preloaded classifier. If None, the shared one for model_name is taken from the model registry.
+
+    Returns:
+        dict: Mapping of vibe name to a score in [0, 1].
+    """
+    if not text.strip():
+        return {vibe: 0.0 for vibe in vibes_list}
+    classifier = classifier or get_model_registry().get_zero_shot(model_name)
+    result = classifier(text, vibes_list, multi_label=True)
+    return dict(zip(result['labels'], result['scores']))
+
 def vibe_classification_nlp(hashtags, caption, audio_transcript, vibes_list, detections=None, top_k=3, model_name="facebook/bart-large-mnli"):
     """
     Classifies vibes for a video using HuggingFace Transformers zero-shot-classification.
+    The classifier is loaded once per process through the model registry.
     If no objects are detected (detections is an empty list), returns an empty list.
 
     Args:
@@ -127,28 +186,132 @@ def vibe_classification_nlp(hashtags, caption, audio_transcript, vibes_list, det
     Returns:
         list[str]: List of classified vibes (strings). Returns an empty list if no objects are detected or if classification fails.
     """
-    from transformers import pipeline
     logger.info("Starting NLP-based vibe classification (Transformers)...")
     if detections is not None and len(detections) == 0:
         logger.info("No objects detected for this video. Returning empty vibes list.")
         return []
     try:
-        text = caption or ""
-        if audio_transcript:
-            if isinstance(audio_transcript, list):
-                text += "\n" + " ".join(audio_transcript)
-            else:
-                text += "\n" + audio_transcript
-        if hashtags:
-            if isinstance(hashtags, list):
-                text += "\n" + " ".join(hashtags)
-            else:
-                text += "\n" + hashtags
-        classifier = pipeline("zero-shot-classification", model=model_name)
-        result = classifier(text, vibes_list, multi_label=True)
-        sorted_vibes = [v for _, v in sorted(zip(result['scores'], result['labels']), reverse=True)]
+        scores = text_vibe_scores(_join_texts(hashtags, caption, audio_transcript), vibes_list, model_name)
+        sorted_vibes = sorted(scores, key=scores.get, reverse=True)
         logger.info(f"NLP vibes classified: {sorted_vibes[:top_k]}")
         return sorted_vibes[:top_k]
     except Exception as e:
         logger.error(f"NLP vibe classification failed: {e}", exc_info=True)
-        return []
\ No newline at end of file
+        return []
+
+_vibe_text_embeddings = {}
+_vibe_text_lock = threading.Lock()
+
+def _vibe_prompts(vibe):
+    descriptions = dict(VIBES_DESC)
+    prompts = [f"a photo of a {vibe} fashion outfit"]
+    if vibe in descriptions:
+        prompts.append(f"{vibe} style: {descriptions[vibe]}")
+    return prompts
+
+def vibe_text_embeddings(vibes_list, clip_model, clip_model_and_processor=None):
+    """
+    Returns normalized CLIP text embeddings of the vibes, one row per vibe, computed once per
+    process and CLIP model. Each vibe is embedded as the mean of a few prompts built from its
+    name and, for the vibes in VIBES_DESC, its description.
+
+    Args:
+        vibes_list (list[str]): Vibe names.
+        clip_model (str): Name of the CLIP model.
+        clip_model_and_processor (tuple, optional): Preloaded (CLIPModel, CLIPProcessor). If None, the shared pair for clip_model is taken from the model registry.
+
+    Returns:
+        np.ndarray: Float32 array of shape (len(vibes_list), D).
+    """
+    key = (clip_model, tuple(vibes_list))
+    with _vibe_text_lock:
+        if key in _vibe_text_embeddings:
+            return _vibe_text_embeddings[key]
+        import torch
+        model, processor = clip_model_and_processor or get_model_registry().get_clip(clip_model)
+        rows = []
+        for vibe in vibes_list:
+            inputs = processor(text=_vibe_prompts(vibe), return_tensors="pt", padding=True, truncation=True)
+            with torch.no_grad():
+                embedding = model.get_text_features(**inputs)
+            embedding = embedding / embedding.norm(p=2, dim=-1, keepdim=True)
+            mean = embedding.mean(dim=0)
+            rows.append((mean / mean.norm()).cpu().numpy())
+        _vibe_text_embeddings[key] = np.stack(rows).astype(np.float32)
+        logger.info(f"Computed CLIP text embeddings for {len(vibes_list)} vibes.")
+        return _vibe_text_embeddings[key]
+
+def clip_vibe_scores(image_embeddings, vibes_list, clip_model, clip_model_and_processor=None, temperature=100.0):
+    """
+    Scores each vibe against the video's CLIP image embeddings (e.g. its garment crops).
+    The embeddings are averaged into one video embedding, compared with the vibe text
+    embeddings, and turned into probabilities with a softmax at CLIP's logit scale.
+
+    Args:
+        image_embeddings (np.ndarray): Normalized CLIP image embeddings of shape (N, D).
+        vibes_list (list[str]): Vibe names to score.
+        clip_model (str): Name of the CLIP model the embeddings come from.
+        clip_model_and_processor (tuple, optional): Preloaded (CLIPModel, CLIPProcessor).
+        temperature (float): Softmax scale applied to cosine similarities. Defaults to 100 (CLIP's logit scale).
+
+    Returns:
+        dict: Mapping of vibe name to a probability; empty if there are no image embeddings.
+    """
+    if image_embeddings is None or len(image_embeddings) == 0:
+        return {}
+    video_embedding = np.asarray(image_embeddings, dtype=np.float32).mean(axis=0)
+    video_embedding /= max(float(np.linalg.norm(video_embedding)), 1e-12)
+    logits = temperature * (vibe_text_embeddings(vibes_list, clip_model, clip_model_and_processor) @ video_embedding)
+    probs = np.exp(logits - logits.max())
+    probs /= probs.sum()
+    return {vibe: float(p) for vibe, p in zip(vibes_list, probs)}
+
+def vibe_classification_local(image_embeddings, vibes_list, clip_model, hashtags=None, caption=None, audio_transcript=None,
+                              detections=None, text_model=None, text_weight=0.3, top_k=3, min_score=0.15,
+                              clip_model_and_processor=None):
+    """
+    Classifies vibes locally, without any network call, from the CLIP image embeddings the
+    pipeline already computed, optionally fused with a zero-shot text classifier over the
+    caption, transcript and hashtags.
+    If no objects are detected (detections is an empty list), returns an empty list.
+
+    Args:
+        image_embeddings (np.ndarray): Normalized CLIP image embeddings of shape (N, D).
+        vibes_list (list[str]): List of valid vibe names.
+        clip_model (str): Name of the CLIP model the embeddings come from.
+        hashtags (list[str] or str, optional): Hashtags, used by the text classifier.
+        caption (str, optional): Caption text, used by the text classifier.
+        audio_transcript (list[str] or str, optional): Transcript, used by the text classifier.
+        detections (list, optional): Detected objects. If provided and empty, vibes will be empty.
+        text_model (str, optional): HuggingFace zero-shot model to fuse in. CLIP only if None.
+        text_weight (float): Weight of the text scores in the fusion. Defaults to 0.3.
+        top_k (int): Maximum number of vibes to return. Defaults to 3.
+        min_score (float): Minimum fused score for a vibe to be returned (the best vibe is always kept). Defaults to 0.15.
+        clip_model_and_processor (tuple, optional): Preloaded (CLIPModel, CLIPProcessor).
+
+    Returns:
+        list[str]: Lower-cased vibes, best first. Returns an empty list if nothing can be classified.
+
+    Logs classification progress and errors. Returns an empty list if classification fails.
+    """
+    logger.info("Starting local vibe classification...")
+    if detections is not None and len(detections) == 0:
+        logger.info("No objects detected for this video. Returning empty vibes list.")
+        return []
+    try:
+        scores = clip_vibe_scores(image_embeddings, vibes_list, clip_model, clip_model_and_processor)
+        if text_model:
+            text_scores = text_vibe_scores(_join_texts(hashtags, caption, audio_transcript), vibes_list, text_model)
+            if scores:
+                scores = {v: (1 - text_weight) * scores[v] + text_weight * text_scores.get(v, 0.0) for v in vibes_list}
+            else:
+                scores = text_scores
+        if not scores:
+            return []
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        vibes = [v for i, v in enumerate(ranked[:top_k]) if i == 0 or scores[v] >= min_score]
+        logger.info(f"Local vibes classified: {vibes} (scores: { {v: round(scores[v], 3) for v in ranked} })")
+        return [v.lower() for v in vibes]
+    except Exception as e:
+        logger.error(f"Local vibe classification failed: {e}", exc_info=True)
+        return []
@@ -11,6 +11,7 @@ try:
     MODELS_DIR = os.path.join(BASE_DIR, "models")
     LOGS_DIR = os.path.join(BASE_DIR, "logs")
     OUTPUTS_DIR = os.path.join(BASE_DIR, "outputs")
+    RESULT_CACHE_DIR = os.path.join(OUTPUTS_DIR, "cache")
 
     # Data files
     CATALOG_CSV_PATH = os.path.join(DATA_DIR, "catalog.csv")
@@ -20,15 +21,83 @@ try:
     DETECTIONS_DIR = os.path.join(DATA_DIR, "detections")
     FRAMES_DIR = os.path.join(DATA_DIR, "frames")
     CROPS_DIR = os.path.join(DATA_DIR, "crops")
+    CATALOG_IMAGE_CACHE_DIR = os.path.join(DATA_DIR, "image_cache")
+    CROP_EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, "crop_embeddings.sqlite")
 
     # Model files
     YOLO_MODEL_PATH = os.path.join(MODELS_DIR, "yolov8n-best.pt")
     CATALOG_EMBEDDINGS_PATH = os.path.join(MODELS_DIR, "catalog_clip_embeddings.npy")
     CATALOG_PRODUCT_IDS_PATH = os.path.join(MODELS_DIR, "catalog_product_ids.json")
+    CATALOG_INDEX_PATH = os.path.join(MODELS_DIR, "catalog_clip.faiss")
+
+    # URLs under this path on one of these hosts are served from VIDEOS_DIR by api/server.py,
+    # so the pipeline opens the file in place instead of downloading it
+    VIDEOS_URL_PATH = "/videos/"
+    LOCAL_VIDEO_HOSTS = [
+        h.strip() for h in os.environ.get("FLICKD_LOCAL_VIDEO_HOSTS", "localhost,127.0.0.1,0.0.0.0,::1").split(",") if h.strip()
+    ]
 
     # Other config values can be added here as needed
     CLIP_MODEL_NAME = "openai/clip-vit-large-patch14"
 
+    # Kind of FAISS index searched for catalog matches: flat (exact), ivf_flat, hnsw or ivf_pq
+    CATALOG_INDEX_TYPE = os.environ.get("FLICKD_CATALOG_INDEX_TYPE", "flat")
+
+    # Catalog categories searched for each class of the YOLO model (its 29 Fashionpedia `names`).
+    # Classes mapped to an empty tuple have no counterpart in the catalog and are not matched;
+    # classes missing here are searched against the whole catalog when category fallback is enabled
+    YOLO_CLASS_TO_CATEGORIES = {
+        "shirt": ("shirt", "top"),
+        "top, t-shirt, sweatshirt": ("top", "tshirt", "co-ord"),
+        "sweater": ("top",),
+        "cardigan": ("jacket", "top"),
+        "jacket": ("jacket", "co-ord"),
+        "vest": ("top", "jacket"),
+        "coat": ("jacket",),
+        "pants": ("trouser", "jeans", "co-ord"),
+        "shorts": ("shorts", "skorts", "co-ord"),
+        "skirt": ("skirt", "skorts", "co-ord"),
+        "dress": ("dress",),
+        "jumpsuit": ("jumpsuit", "playsuit"),
+        "cape": ("jacket",),
+        "glasses": (),
+        "hat": (),
+        "headband, head covering, hair accessory": (),
+        "tie": (),
+        "glove": (),
+        "watch": (),
+        "belt": (),
+        "tights, stockings": (),
+        "sock": (),
+        "shoe": (),
+        "bag, wallet": (),
+        "scarf": (),
+        # Garment parts and decorations: a hood belongs to a jacket or sweatshirt, the rest
+        # appear on too many garments to pick a category
+        "hood": ("jacket", "top"),
+        "bow": (),
+        "flower": (),
+        "ruffle": (),
+    }
+
+    # Load and warm up YOLO, CLIP and Whisper when the API starts (set to "0" to load lazily)
+    WARMUP_MODELS = os.environ.get("FLICKD_WARMUP_MODELS", "1") != "0"
+
+    # Maximum number of results kept in the content-addressed result cache (LRU eviction)
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("FLICKD_RESULT_CACHE_MAX_ENTRIES", "1000"))
+
+    # Maximum number of CLIP crop embeddings kept in the crop embedding cache (LRU eviction)
+    CROP_EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("FLICKD_CROP_EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+    # Background pipeline jobs: worker threads and maximum number of queued (not yet running) jobs
+    JOB_WORKERS = int(os.environ.get("FLICKD_JOB_WORKERS", "2"))
+    JOB_QUEUE_SIZE = int(os.environ.get("FLICKD_JOB_QUEUE_SIZE", "16"))
+
+    # OpenAI-compatible chat completions endpoint and model used for vibe classification
+    # (point FLICKD_LLM_BASE_URL at a local mock server for testing)
+    LLM_BASE_URL = os.environ.get("FLICKD_LLM_BASE_URL", "https://api.groq.com/openai/v1")
+    LLM_MODEL = os.environ.get("FLICKD_LLM_MODEL", "llama3-8b-8192")
+
     # Add this to make GROQ_API_KEY available in your backend
     GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 
@@ -45,17 +114,32 @@ Attributes:
     MODELS_DIR (str): Path to the models directory.
     LOGS_DIR (str): Path to the logs directory.
     OUTPUTS_DIR (str): Path to the outputs directory.
+    RESULT_CACHE_DIR (str): Path to the content-addressed result cache.
     CATALOG_CSV_PATH (str): Path to the product catalog CSV file.
     VIBES_LIST_PATH (str): Path to the vibes list JSON file.
     VIDEOS_DIR (str): Path to the videos directory.
+    VIDEOS_URL_PATH (str): URL path under which VIDEOS_DIR is mounted by the API.
+    LOCAL_VIDEO_HOSTS (list[str]): Hostnames treated as this server when resolving video URLs (FLICKD_LOCAL_VIDEO_HOSTS env var).
     TRANSCRIPTS_DIR (str): Path to the transcripts directory.
     DETECTIONS_DIR (str): Path to the detections directory.
     FRAMES_DIR (str): Path to the frames directory.
     CROPS_DIR (str): Path to the crops directory.
+    CATALOG_IMAGE_CACHE_DIR (str): Path to the raw catalog image cache (files named by URL hash).
+    CROP_EMBEDDING_CACHE_PATH (str): Path to the SQLite cache of CLIP crop embeddings.
     YOLO_MODEL_PATH (str): Path to the YOLO model weights file.
     CATALOG_EMBEDDINGS_PATH (str): Path to the catalog CLIP embeddings file.
     CATALOG_PRODUCT_IDS_PATH (str): Path to the catalog product IDs file.
+    CATALOG_INDEX_PATH (str): Path to the serialized FAISS index over the catalog embeddings.
     CLIP_MODEL_NAME (str): Name of the CLIP model to use.
+    CATALOG_INDEX_TYPE (str): Default catalog FAISS index type (FLICKD_CATALOG_INDEX_TYPE env var).
+    YOLO_CLASS_TO_CATEGORIES (dict): Catalog categories searched for each YOLO class name.
+    WARMUP_MODELS (bool): Whether the API preloads models on startup (FLICKD_WARMUP_MODELS env var).
+    RESULT_CACHE_MAX_ENTRIES (int): Maximum number of cached results (FLICKD_RESULT_CACHE_MAX_ENTRIES env var).
+    CROP_EMBEDDING_CACHE_MAX_ENTRIES (int): Maximum number of cached crop embeddings (FLICKD_CROP_EMBEDDING_CACHE_MAX_ENTRIES env var).
+    JOB_WORKERS (int): Number of pipeline worker threads in the API (FLICKD_JOB_WORKERS env var).
+    JOB_QUEUE_SIZE (int): Maximum number of queued pipeline jobs before requests get 429 (FLICKD_JOB_QUEUE_SIZE env var).
+    LLM_BASE_URL (str): Base URL of the OpenAI-compatible LLM API (FLICKD_LLM_BASE_URL env var).
+    LLM_MODEL (str): LLM used for vibe classification (FLICKD_LLM_MODEL env var).
     GROQ_API_KEY (str): GROQ API key for backend access.
 
 Logs configuration setup and errors. Raises no exceptions on import; logs errors instead.
@@ -1,53 +1,230 @@
 import os
 import json
+import time
+import threading
+import cv2
 import numpy as np
 import pandas as pd
-from components.extract_frames import extract_frames
-from components.detect import detect_fashion_items
+from components.extract_frames import sample_frames, save_frames
+from components.detect import detect_fashion_items_batch
 from components.transcribe import transcribe_audio
-from components.match import match_product
+from components.match import match_products
+from components.track import track_detections, best_track_members, track_summary
 from utils.logger import get_logger
-from utils.download import download_video
-from components.vibe import vibe_classification_nlp, vibe_classification
-from utils.extract_catalog_embeddings import extract_and_save_catalog_embeddings
-from config import FRAMES_DIR, YOLO_MODEL_PATH, TRANSCRIPTS_DIR, CLIP_MODEL_NAME, CATALOG_EMBEDDINGS_PATH, CATALOG_PRODUCT_IDS_PATH, CATALOG_CSV_PATH, MODELS_DIR, OUTPUTS_DIR, VIBES_LIST_PATH, GROQ_API_KEY
+from utils.download import start_video_download, resolve_local_video, fetch_validators
+from components.vibe import vibe_classification_nlp, vibe_classification, vibe_classification_local
+from utils.extract_catalog_embeddings import extract_and_save_catalog_embeddings, get_clip_embeddings
+from config import FRAMES_DIR, YOLO_MODEL_PATH, TRANSCRIPTS_DIR, CLIP_MODEL_NAME, CATALOG_EMBEDDINGS_PATH, CATALOG_PRODUCT_IDS_PATH, CATALOG_INDEX_PATH, CATALOG_CSV_PATH, MODELS_DIR, OUTPUTS_DIR, VIBES_LIST_PATH, GROQ_API_KEY, RESULT_CACHE_DIR, RESULT_CACHE_MAX_ENTRIES, CATALOG_INDEX_TYPE, YOLO_CLASS_TO_CATEGORIES, CROP_EMBEDDING_CACHE_PATH, CROP_EMBEDDING_CACHE_MAX_ENTRIES
 from utils.checks import file_exists, directory_exists
-from dataclasses import dataclass
+from utils.model_registry import get_model_registry
+from utils.catalog_index import get_catalog_index, IndexSpec
+from utils.scheduler import StageScheduler
+from utils.batcher import MicroBatcher
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.result_cache import get_result_cache, config_fingerprint, hash_file, file_version
+from utils.embedding_cache import get_crop_embedding_cache
+from utils.metrics import PIPELINES_IN_FLIGHT, PIPELINE_RUNS, FRAMES_PER_VIDEO, DETECTIONS_PER_FRAME
+from dataclasses import dataclass, replace
 
 logger = get_logger(__name__)
 
 @dataclass
 class PipelineConfig:
     frame_rate: int = 1
+    sampling_mode: str = "grab"
+    scene_threshold: float = 0.3
     conf: float = 0.3
+    detect_batch_size: int = 16
+    clip_batch_size: int = 32
+    stage_workers: int = 4
+    debug: bool = False
+    save_frames: bool = False
     model_size: str = "small"
     yolo_model: str = YOLO_MODEL_PATH
     clip_model: str = CLIP_MODEL_NAME
     catalog_embeddings_file: str = CATALOG_EMBEDDINGS_PATH
     catalog_product_ids_file: str = CATALOG_PRODUCT_IDS_PATH
+    catalog_index_file: str = CATALOG_INDEX_PATH
     catalog_csv_file: str = CATALOG_CSV_PATH
+    index_type: str = CATALOG_INDEX_TYPE
+    index_nlist: int = 1024
+    index_hnsw_m: int = 32
+    index_ef_construction: int = 200
+    index_pq_m: int = 32
+    index_pq_nbits: int = 8
+    index_nprobe: int = 16
+    index_ef_search: int = 64
+    index_collapse_threshold: float = 0.0
+    match_pooling: str = "max"
+    match_overfetch: int = 4
+    category_search: bool = True
+    category_fallback: bool = True
+    tracking: bool = True
+    track_iou_threshold: float = 0.3
+    track_max_gap: int = 2
+    track_crops: int = 1
+    vibe_engine: str = "auto"
+    vibe_text_model: str = ""
+    vibe_text_weight: float = 0.3
     models_dir: str = MODELS_DIR
     outputs_dir: str = OUTPUTS_DIR
     frames_dir: str = FRAMES_DIR
     transcripts_dir: str = TRANSCRIPTS_DIR
     vibes_list_file: str = VIBES_LIST_PATH
+    result_cache_dir: str = RESULT_CACHE_DIR
+    use_result_cache: bool = True
+    crop_embedding_cache_file: str = CROP_EMBEDDING_CACHE_PATH
+    use_crop_embedding_cache: bool = True
+
+    def index_spec(self):
+        """
+        Returns the IndexSpec for the catalog FAISS index described by the index_* fields.
+        """
+        return IndexSpec(
+            index_type=self.index_type,
+            nlist=self.index_nlist,
+            hnsw_m=self.index_hnsw_m,
+            ef_construction=self.index_ef_construction,
+            pq_m=self.index_pq_m,
+            pq_nbits=self.index_pq_nbits,
+            nprobe=self.index_nprobe,
+            ef_search=self.index_ef_search,
+            collapse_threshold=self.index_collapse_threshold,
+        )
+
+# PipelineConfig fields that change pipeline output and therefore key the result cache
+RESULT_CACHE_FIELDS = (
+    "frame_rate",
+    "sampling_mode",
+    "scene_threshold",
+    "conf",
+    "model_size",
+    "yolo_model",
+    "clip_model",
+    "index_type",
+    "index_nlist",
+    "index_hnsw_m",
+    "index_ef_construction",
+    "index_pq_m",
+    "index_pq_nbits",
+    "index_nprobe",
+    "index_ef_search",
+    "index_collapse_threshold",
+    "match_pooling",
+    "match_overfetch",
+    "category_search",
+    "category_fallback",
+    "tracking",
+    "track_iou_threshold",
+    "track_max_gap",
+    "track_crops",
+    "vibe_engine",
+    "vibe_text_model",
+    "vibe_text_weight",
+)
+
+def resolve_vibe_engine(config):
+    """
+    Returns the vibe engine a config runs with: "auto" becomes "llm" when a Groq key is set, else "local".
+    """
+    if config.vibe_engine != "auto":
+        return config.vibe_engine
+    return "llm" if GROQ_API_KEY else "local"
+
+def pipeline_fingerprint(config):
+    """
+    Returns the result cache fingerprint of a config: its output-affecting fields, the resolved
+    vibe engine, and the versions of the catalog and vibes files.
+    """
+    return config_fingerprint(
+        replace(config, vibe_engine=resolve_vibe_engine(config)),
+        RESULT_CACHE_FIELDS,
+        version_files=(config.catalog_embeddings_file, config.catalog_product_ids_file, config.catalog_csv_file, config.vibes_list_file)
+    )
+
+def find_cached_result(result_cache, fingerprint, video_url, revalidate=True):
+    """
+    Looks up a cached result without downloading or decoding the video.
+    Local videos are identified by their (memoized) content hash; remote URLs by the
+    content hash they resolved to last time. When an ETag or Content-Length was recorded
+    for the URL, it is revalidated with a HEAD request, or, if revalidate is False,
+    the lookup is left to the pipeline run and None is returned.
+    Returns the cached output dict, or None on a miss.
+    """
+    local_path = resolve_local_video(video_url)
+    if local_path:
+        content_hash = result_cache.file_hash(local_path)
+    else:
+        known = result_cache.url_hash(video_url)
+        if not known:
+            return None
+        if known.get("etag") or known.get("content_length"):
+            if not revalidate:
+                return None
+            current = fetch_validators(video_url)
+            if current is None or current["etag"] != known.get("etag") or current["content_length"] != known.get("content_length"):
+                return None
+        content_hash = known["content_hash"]
+    return result_cache.get(result_cache.key(content_hash, fingerprint))
+
+class CachedResultFound(Exception):
+    """
+    Raised inside the pipeline DAG when the downloaded video turns out to have a cached result.
+    """
+
+    def __init__(self, result):
+        super().__init__("Cached result found")
+        self.result = result
 
 class FlickdPipeline:
-    def __init__(self, video_item, config: PipelineConfig):
+    def __init__(self, video_item, config: PipelineConfig, registry=None, batchers=None):
         self.video_item = video_item
+        # Optional {"yolo": MicroBatcher, "clip": MicroBatcher} shared with other pipelines (see run_pipeline_batch)
+        self.batchers = batchers
         self.frame_rate = config.frame_rate
+        self.sampling_mode = config.sampling_mode
+        self.scene_threshold = config.scene_threshold
         self.conf = config.conf
+        self.detect_batch_size = config.detect_batch_size
+        self.clip_batch_size = config.clip_batch_size
+        self.stage_workers = config.stage_workers
+        self.debug = config.debug
+        self.save_frames = config.save_frames
         self.model_size = config.model_size
         self.yolo_model = config.yolo_model
         self.clip_model = config.clip_model
         self.catalog_embeddings_file = config.catalog_embeddings_file
         self.catalog_product_ids_file = config.catalog_product_ids_file
+        self.catalog_index_file = config.catalog_index_file
         self.catalog_csv_file = config.catalog_csv_file
+        self.index_spec = config.index_spec()
+        self.match_pooling = config.match_pooling
+        self.match_overfetch = config.match_overfetch
+        self.class_categories = YOLO_CLASS_TO_CATEGORIES if config.category_search else None
+        self.category_fallback = config.category_fallback
+        self.tracking = config.tracking
+        self.track_iou_threshold = config.track_iou_threshold
+        self.track_max_gap = config.track_max_gap
+        self.track_crops = config.track_crops
+        # "llm" asks the Groq LLM, "local" scores vibes with CLIP (plus an optional text model), "auto" uses the LLM when a key is set
+        self.vibe_engine = resolve_vibe_engine(config)
+        self.vibe_text_model = config.vibe_text_model or None
+        self.vibe_text_weight = config.vibe_text_weight
         self.models_dir = config.models_dir
         self.outputs_dir = config.outputs_dir
         self.transcripts_dir = config.transcripts_dir
         self.frames_dir = config.frames_dir
         self.vibes_list_file = config.vibes_list_file
+        self.use_result_cache = config.use_result_cache
+        self.result_cache = get_result_cache(config.result_cache_dir, RESULT_CACHE_MAX_ENTRIES) if config.use_result_cache else None
+        self.config_fingerprint = pipeline_fingerprint(config)
+        self.crop_embedding_cache = (
+            get_crop_embedding_cache(config.crop_embedding_cache_file, CROP_EMBEDDING_CACHE_MAX_ENTRIES)
+            if config.use_crop_embedding_cache else None
+        )
+        self.registry = registry or get_model_registry()
+        self.stage_report = None
+        self.frames_sampled = None
         self.logger = logger
         self._ensure_directories_exist()
 
@@ -60,45 +237,112 @@ class FlickdPipeline:
                 os.makedirs(d, exist_ok=True)
                 self.logger.info(f"Created directory: {d}")
 
-    def download_video_and_get_id(self, video_url):
+    def lookup_cached_result(self, video_url):
+        """
+        Looks up a cached result for the video without downloading or decoding it (see find_cached_result).
+        Returns the cached output dict, or None on a miss.
+        """
+        if self.result_cache is None:
+            return None
+        return find_cached_result(self.result_cache, self.config_fingerprint, video_url)
+
+    def content_hash(self, video_url, video_path, download=None):
+        """
+        Returns the content hash of an opened video and, for downloads, remembers which hash the URL resolved to.
+        """
+        if download is None:
+            return self.result_cache.file_hash(video_path)
+        content_hash = hash_file(video_path)
+        self.result_cache.remember_url(video_url, content_hash, etag=download.etag, content_length=download.total_bytes)
+        return content_hash
+
+    def start_download(self, video_url):
+        """
+        Starts streaming the video to a temp file in the background and returns the VideoDownload.
+        Returns None if the URL points at a video served from our own videos directory.
         """
-        Downloads the video and returns (video_id, video_capture, tmp_video_file).
+        if resolve_local_video(video_url):
+            return None
+        return start_video_download(video_url)
+
+    def download_video_and_get_id(self, video_url, download=None):
+        """
+        Opens the video and returns (video_id, video_capture, video_path, is_temp).
+        URLs served by our own /videos mount are opened in place; other URLs are
+        downloaded to a temp file (waiting for `download` if one was started), and
+        is_temp tells the caller to delete it when done.
         Raises an exception if download or opening fails.
         """
         video_id = os.path.splitext(os.path.basename(video_url))[0]
-        video_capture, tmp_video_file = download_video(video_url)
+        local_path = resolve_local_video(video_url)
+        if local_path:
+            video_path, is_temp = local_path, False
+        else:
+            download = download or start_video_download(video_url)
+            video_path, is_temp = download.wait().name, True
+            self.logger.info(f"Downloaded {video_id}: {download.stats()}")
+        video_capture = cv2.VideoCapture(video_path)
         if not video_capture or not video_capture.isOpened():
-            raise Exception("Failed to open video capture from downloaded bytes.")
-        return video_id, video_capture, tmp_video_file
+            if is_temp:
+                os.remove(video_path)
+            raise Exception(f"Failed to open video capture for {video_url}.")
+        return video_id, video_capture, video_path, is_temp
 
-    def transcribe_audio(self, tmp_video_file, video_id):
+    def transcribe_audio(self, video_path, video_id):
         """
         Transcribes audio from the video file and returns the transcript path.
         Raises an exception if transcription fails.
         """
-        return transcribe_audio(tmp_video_file, video_id, self.transcripts_dir, self.model_size)
+        return transcribe_audio(
+            video_path,
+            video_id,
+            self.transcripts_dir,
+            self.model_size,
+            model=self.registry.get_whisper(self.model_size)
+        )
 
-    def extract_frames(self, video_id, video_capture):
+    def extract_frames(self, video_id, video_capture, started_at=None):
         """
-        Extracts frames from the video and saves them to the frames directory.
-        Raises an exception if extraction fails.
+        Samples frames from the video and keeps them in memory as BGR arrays.
+        Frames are also written to the frames directory when save_frames or debug is enabled.
+        If started_at (a time.perf_counter() value) is given, logs the time to the first sampled frame.
+        Returns the list of frame dicts.
         """
-        return extract_frames(video_id, video_capture, self.frames_dir, self.frame_rate)
+        def log_first_frame(frame):
+            if started_at is not None and frame["frame_number"] == 0:
+                self.logger.info(f"Time to first frame for {video_id}: {time.perf_counter() - started_at:.2f}s")
+
+        frames = sample_frames(
+            video_id,
+            video_capture,
+            self.frame_rate,
+            mode=self.sampling_mode,
+            scene_threshold=self.scene_threshold,
+            on_frame=log_first_frame
+        )
+        self.frames_sampled = len(frames)
+        FRAMES_PER_VIDEO.observe(len(frames))
+        if self.save_frames or self.debug:
+            save_frames(video_id, frames, self.frames_dir)
+        return frames
 
     def prepare_catalog_embeddings(self):
         """
-        Loads or generates catalog embeddings and product IDs as needed.
-        Returns (catalog_embeddings, catalog_product_ids, catalog_csv).
+        Loads or generates catalog embeddings as needed and returns the shared CatalogIndex.
+        The FAISS index is built and serialized once and reused across pipeline runs.
         Raises an exception if loading or generation fails.
         """
-        catalog_csv = pd.read_csv(self.catalog_csv_file)
         if not (file_exists(self.catalog_embeddings_file) and file_exists(self.catalog_product_ids_file)):
             self.logger.warning("Required catalog files not found. Generating catalog embeddings...")
+            catalog_csv = pd.read_csv(self.catalog_csv_file)
             extract_and_save_catalog_embeddings(catalog_csv, self.models_dir, self.clip_model)
-        catalog_embeddings = np.load(self.catalog_embeddings_file)
-        with open(self.catalog_product_ids_file, "r") as f:
-            catalog_product_ids = json.load(f)
-        return catalog_embeddings, catalog_product_ids, catalog_csv
+        return get_catalog_index(
+            self.catalog_embeddings_file,
+            self.catalog_product_ids_file,
+            self.catalog_csv_file,
+            self.catalog_index_file,
+            spec=self.index_spec
+        )
 
     def classify_vibes(self, hashtags, caption, transcript_file, vibes_list, detections=None):
         """
@@ -114,38 +358,95 @@ class FlickdPipeline:
             groq_api_key=GROQ_API_KEY
         )
 
-    def detect_and_match_products(self, frames_path, catalog_embeddings, catalog_product_ids, catalog_csv):
+    def classify_vibes_local(self, hashtags, caption, transcript, vibes_list, crop_embeddings, detections=None):
         """
-        Detects fashion items in all frames and matches them to catalog products.
-        Returns (unique_matches, all_detections).
+        Classifies vibes without a network call from the CLIP embeddings of the matched crops,
+        fused with the configured zero-shot text model if any. Returns a list of vibes.
+        """
+        return vibe_classification_local(
+            crop_embeddings,
+            vibes_list,
+            self.clip_model,
+            hashtags=hashtags,
+            caption=caption,
+            audio_transcript=transcript,
+            detections=detections,
+            text_model=self.vibe_text_model,
+            text_weight=self.vibe_text_weight
+        )
+
+    def detect_and_match_products(self, frames, catalog_index):
+        """
+        Detects fashion items in all in-memory frames and matches them to catalog products.
+        With tracking enabled, detections are grouped into tracks across frames and only the
+        best crop(s) of each track are embedded and matched; each product then carries the
+        track_length and frame_ranges of the tracks it was matched from.
+        Returns (unique_matches, all_detections, crop_embeddings), where crop_embeddings are the
+        CLIP embeddings of the matched crops (None if there were none).
         """
         unique_matches = {}
         all_detections = []
-        for frame_file in os.listdir(frames_path):
-            if frame_file.endswith('.jpg'):
-                frame_filepath = os.path.join(frames_path, frame_file)
-                detections = detect_fashion_items(
-                    frame_filepath,
-                    self.yolo_model,
-                    self.conf
-                )
-                all_detections.extend(detections)
-                for detection in detections:
-                    matches = match_product(
-                        detection,
-                        frame_filepath,
-                        catalog_embeddings,
-                        catalog_product_ids,
-                        catalog_csv,
-                        self.clip_model,
-                        top_k=1
-                    )
-                    for match in matches:
-                        pid = match["matched_product_id"]
-                        # Keep only the highest confidence match for each product
-                        if (pid not in unique_matches) or (match["confidence"] > unique_matches[pid]["confidence"]):
-                            unique_matches[pid] = match
-        return unique_matches, all_detections
+        yolo_model = None if self.batchers else self.registry.get_yolo(self.yolo_model)
+        if self.batchers:
+            per_frame_detections = self.batchers["yolo"].submit_many(frames)
+        else:
+            per_frame_detections = detect_fashion_items_batch(
+                frames,
+                self.yolo_model,
+                self.conf,
+                batch_size=self.detect_batch_size,
+                model=yolo_model,
+                save=self.debug
+            )
+        for detections in per_frame_detections:
+            all_detections.extend(detections)
+            DETECTIONS_PER_FRAME.observe(len(detections))
+        queries = []
+        if self.tracking:
+            tracks = track_detections(
+                per_frame_detections,
+                iou_threshold=self.track_iou_threshold,
+                max_gap=self.track_max_gap
+            )
+            for track in tracks:
+                for member in best_track_members(track, per_frame_detections, self.track_crops):
+                    queries.append((member, track))
+        else:
+            # Every detection is matched on its own, as a single-member track
+            for frame_index, detections in enumerate(per_frame_detections):
+                for det_index in range(len(detections)):
+                    queries.append(((frame_index, det_index), {"track_id": len(queries)}))
+        self.logger.info(f"Matching {len(queries)} crops for {len(all_detections)} detections.")
+        all_matches, crop_embeddings = match_products(
+            [per_frame_detections[f][d] for (f, d), _ in queries],
+            [frames[f] for (f, _), _ in queries],
+            catalog_index,
+            self.clip_model,
+            top_k=1,
+            clip_model_and_processor=None if self.crop_embedding_cache is not None or self.batchers else self.registry.get_clip(self.clip_model),
+            batch_size=self.clip_batch_size,
+            pooling=self.match_pooling,
+            overfetch=self.match_overfetch,
+            class_categories=self.class_categories,
+            category_fallback=self.category_fallback,
+            embedding_cache=self.crop_embedding_cache,
+            return_embeddings=True,
+            embed_fn=(lambda crops: np.stack(self.batchers["clip"].submit_many(crops))) if self.batchers else None
+        )
+        product_tracks = {}
+        for matches, (_, track) in zip(all_matches, queries):
+            for match in matches:
+                pid = match["matched_product_id"]
+                product_tracks.setdefault(pid, {})[track["track_id"]] = track
+                # Keep only the highest confidence match for each product
+                if (pid not in unique_matches) or (match["confidence"] > unique_matches[pid]["confidence"]):
+                    unique_matches[pid] = match
+        if self.tracking:
+            for pid, match in unique_matches.items():
+                summaries = [track_summary(track, frames) for track in product_tracks[pid].values()]
+                match["track_length"] = sum(summary["track_length"] for summary in summaries)
+                match["frame_ranges"] = sorted(r for summary in summaries for r in summary["frame_ranges"])
+        return unique_matches, all_detections, crop_embeddings
 
     def save_output(self, video_id, vibes, unique_matches):
         """
@@ -164,43 +465,159 @@ class FlickdPipeline:
         return output_path
 
     def run(self):
+        """
+        Runs the pipeline as a DAG of stages so independent work overlaps:
+        transcription runs alongside frame extraction and detect/match, the catalog
+        index loads while the video downloads, and vibes are classified once both the
+        transcript and the detections are ready (reels with no detections skip it). Per-stage timings and the critical path are kept
+        in self.stage_report.
+        Counts the run in the in-flight pipelines gauge while it runs, and its outcome
+        (done, cached or failed) in the pipeline runs metric.
+        """
+        PIPELINES_IN_FLIGHT.inc()
+        try:
+            status = self._run()
+        except Exception:
+            PIPELINE_RUNS.inc(status="failed")
+            raise
+        finally:
+            PIPELINES_IN_FLIGHT.dec()
+        PIPELINE_RUNS.inc(status=status)
 
+    def _run(self):
+        """
+        Runs the stages (see run). Returns "cached" if the result came from the result cache, else "done".
+        """
         video_dict = self.video_item.dict() if hasattr(self.video_item, "dict") else self.video_item
         video_url = video_dict.get("videoUrl")
         hashtags = video_dict.get("hashtags")
         caption = video_dict.get("caption")
         self.logger.info(f"Starting pipeline for video: {video_url}")
-        try:
-            # Download video (modularized)
-            video_id, video_capture, tmp_video_file = self.download_video_and_get_id(video_url)
-            # Transcribe audio (modularized)
-            transcript_path = self.transcribe_audio(tmp_video_file, video_id)
+        video_id = os.path.splitext(os.path.basename(video_url))[0]
+        cached = self.lookup_cached_result(video_url)
+        if cached is not None:
+            self.save_output(video_id, cached["vibes"], {p["matched_product_id"]: p for p in cached["products"]})
+            self.logger.info(f"Served {video_url} from the result cache.")
+            return "cached"
+        started_at = time.perf_counter()
+        # Stream the video in the background while the catalog index loads
+        download = self.start_download(video_url)
+        cache_key = {}
+
+        def video_stage():
+            video = self.download_video_and_get_id(video_url, download)
+            if self.result_cache is not None:
+                cache_key["key"] = self.result_cache.key(
+                    self.content_hash(video_url, video[2], download), self.config_fingerprint
+                )
+                cached = self.result_cache.get(cache_key["key"])
+                if cached is not None:
+                    video[1].release()
+                    if video[3]:
+                        os.remove(video[2])
+                    raise CachedResultFound(cached)
+            return video
+
+        def transcript_stage(video):
+            video_id, _, video_path, _ = video
+            transcript_path = self.transcribe_audio(video_path, video_id)
             if not transcript_path or not os.path.exists(transcript_path):
                 raise Exception(f"Transcript file was not created for video_id {video_id}.")
-            # Extract frames (modularized)
-            self.extract_frames(video_id, video_capture)
-            # Prepare catalog embeddings (modularized)
-            catalog_embeddings, catalog_product_ids, catalog_csv = self.prepare_catalog_embeddings()
+            with open(transcript_path, 'r') as f:
+                return f.readlines()
 
-            # Vibe classification (modularized)
+        def vibes_stage(transcript, products):
             with open(self.vibes_list_file, 'r') as f:
                 vibes_list = json.load(f)
-            with open(transcript_path, 'r') as f:
-                transcript_file = f.readlines()
+            _, all_detections, _ = products
+            # Reels with no detections return before any LLM call
+            return self.classify_vibes(hashtags, caption, transcript, vibes_list, detections=all_detections)
 
-            # Detect fashion items and match products
-            frames_path = os.path.join(self.frames_dir, video_id)
-            unique_matches, all_detections = self.detect_and_match_products(
-                frames_path, catalog_embeddings, catalog_product_ids, catalog_csv
-            )
-            vibes = self.classify_vibes(hashtags, caption, transcript_file, vibes_list, detections=all_detections)
-            self.save_output(video_id, vibes, unique_matches)
+        def local_vibes_stage(transcript, products):
+            with open(self.vibes_list_file, 'r') as f:
+                vibes_list = json.load(f)
+            _, all_detections, crop_embeddings = products
+            return self.classify_vibes_local(hashtags, caption, transcript, vibes_list, crop_embeddings, detections=all_detections)
+
+        def output_stage(video, products, vibes):
+            unique_matches, all_detections, _ = products
+            if not all_detections:
+                self.logger.info("No objects detected for this video. Returning empty vibes list.")
+                vibes = []
+            output_path = self.save_output(video[0], vibes, unique_matches)
+            if cache_key.get("key"):
+                # The output is already saved; a cache write failure must not fail the video
+                try:
+                    with open(output_path) as f:
+                        self.result_cache.put(cache_key["key"], json.load(f))
+                except Exception as e:
+                    self.logger.error(f"Failed to store {video[0]} in the result cache: {e}", exc_info=True)
+            return output_path
 
+        scheduler = StageScheduler(max_workers=self.stage_workers, name="flickd")
+        scheduler.add("catalog", self.prepare_catalog_embeddings)
+        scheduler.add("video", video_stage)
+        scheduler.add("transcript", transcript_stage, deps=["video"])
+        scheduler.add("frames", lambda video: self.extract_frames(video[0], video[1], started_at), deps=["video"])
+        scheduler.add("products", lambda frames, catalog: self.detect_and_match_products(frames, catalog), deps=["frames", "catalog"])
+        if self.vibe_engine == "local":
+            scheduler.add("vibes", local_vibes_stage, deps=["transcript", "products"])
+        else:
+            scheduler.add("vibes", vibes_stage, deps=["transcript", "products"])
+        scheduler.add("output", output_stage, deps=["video", "products", "vibes"])
+        try:
+            scheduler.run()
+        except CachedResultFound as hit:
+            self.stage_report = scheduler.report()
+            self.save_output(video_id, hit.result["vibes"], {p["matched_product_id"]: p for p in hit.result["products"]})
+            self.logger.info(f"Video content of {video_url} matched a cached result; skipped processing.")
+            return "cached"
         except Exception as e:
             self.logger.error(f'Pipeline failed with an error: {e}', exc_info=True)
             raise
-        self.logger.info("Pipeline completed successfully.")
-        
+        finally:
+            self.stage_report = scheduler.report()
+            if self.crop_embedding_cache is not None:
+                # Process-wide hit/miss counts of the crop embedding cache
+                self.stage_report["crop_embedding_cache"] = self.crop_embedding_cache.stats()
+            video = scheduler.results.get("video")
+            if video is not None:
+                _, _, video_path, is_temp = video
+                if is_temp and os.path.exists(video_path):
+                    os.remove(video_path)
+            elif download is not None:
+                # The video stage never produced a path; clean up whatever the download wrote
+                download.done.wait()
+                if os.path.exists(download.temp_file.name):
+                    os.remove(download.temp_file.name)
+        self.logger.info(
+            f"Pipeline completed successfully in {self.stage_report['wall_seconds']}s "
+            f"(critical path: {' -> '.join(self.stage_report['critical_path'])}, {self.stage_report['critical_path_seconds']}s)."
+        )
+        return "done"
+
+
+_default_lookup = {"config": None, "versions": None, "fingerprint": None}
+_default_lookup_lock = threading.Lock()
+
+def lookup_cached_result(video_url):
+    """
+    Returns the cached pipeline output for a video URL under the default config, or None on a miss.
+    Meant for the request path: it does not download or decode the video, and makes no network
+    call. Remote URLs that need revalidating are left to the pipeline run. The fingerprint is
+    only recomputed when the catalog or vibes files change.
+    """
+    with _default_lookup_lock:
+        config = _default_lookup["config"] = _default_lookup["config"] or PipelineConfig()
+        if not config.use_result_cache:
+            return None
+        versions = tuple(file_version(p) for p in (config.catalog_embeddings_file, config.catalog_product_ids_file, config.catalog_csv_file, config.vibes_list_file))
+        if versions != _default_lookup["versions"]:
+            _default_lookup["fingerprint"] = pipeline_fingerprint(config)
+            _default_lookup["versions"] = versions
+        fingerprint = _default_lookup["fingerprint"]
+    result_cache = get_result_cache(config.result_cache_dir, RESULT_CACHE_MAX_ENTRIES)
+    return find_cached_result(result_cache, fingerprint, video_url, revalidate=False)
 
 def run_pipeline(video_item):
     """
@@ -210,4 +627,91 @@ def run_pipeline(video_item):
     """
     config = PipelineConfig()
     pipeline = FlickdPipeline(video_item, config)
-    pipeline.run()
\ No newline at end of file
+    pipeline.run()
+
+def make_shared_batchers(config, registry=None, max_wait=0.02):
+    """
+    Creates YOLO and CLIP micro-batchers that several pipelines can share, so frames and crops
+    from different videos are packed into the same forward passes.
+
+    Args:
+        config (PipelineConfig): Config whose models, confidence and batch sizes the batchers use.
+        registry (ModelRegistry, optional): Model registry. Defaults to the process-wide registry.
+        max_wait (float, optional): Seconds a batch waits for more items. Defaults to 0.02.
+
+    Returns:
+        dict: {"yolo": MicroBatcher over frames, "clip": MicroBatcher over PIL crops}.
+    """
+    registry = registry or get_model_registry()
+
+    def detect(frames):
+        return detect_fashion_items_batch(
+            frames,
+            config.yolo_model,
+            config.conf,
+            batch_size=config.detect_batch_size,
+            model=registry.get_yolo(config.yolo_model),
+            save=config.debug
+        )
+
+    def embed(crops):
+        model, processor = registry.get_clip(config.clip_model)
+        return list(get_clip_embeddings(crops, model, processor, batch_size=config.clip_batch_size))
+
+    return {
+        "yolo": MicroBatcher(detect, config.detect_batch_size, max_wait, name="flickd-yolo-batcher"),
+        "clip": MicroBatcher(embed, config.clip_batch_size, max_wait, name="flickd-clip-batcher"),
+    }
+
+def run_pipeline_batch(video_items, config=None, max_concurrent=4, on_complete=None):
+    """
+    Runs the pipeline for many videos at once.
+    Up to max_concurrent videos are processed concurrently in this process; their YOLO and
+    CLIP work goes through shared micro-batchers, so frames and crops of different videos
+    are packed into the same model batches, and their vibe requests fan out concurrently over
+    the pooled LLM client. Each video's output is written as soon as that video finishes.
+
+    Args:
+        video_items (list): Video items (dicts or request bodies) with videoUrl, hashtags and caption.
+        config (PipelineConfig, optional): Config shared by all videos. Defaults to PipelineConfig().
+        max_concurrent (int, optional): Number of videos processed at the same time. Defaults to 4.
+        on_complete (callable, optional): Called with each video's result dict as soon as it finishes.
+
+    Returns:
+        list[dict]: One result per video in completion order, with videoUrl, status ("done" or "failed"),
+            stage_report and, for failures, error.
+    """
+    config = config or PipelineConfig()
+    registry = get_model_registry()
+    batchers = make_shared_batchers(config, registry)
+    results = []
+
+    def run_one(video_item):
+        pipeline = FlickdPipeline(video_item, config, registry=registry, batchers=batchers)
+        pipeline.run()
+        return pipeline
+
+    started_at = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="flickd-batch") as executor:
+            futures = {executor.submit(run_one, item): item for item in video_items}
+            for future in as_completed(futures):
+                item = futures[future]
+                video_url = (item.dict() if hasattr(item, "dict") else item).get("videoUrl")
+                try:
+                    pipeline = future.result()
+                    result = {"videoUrl": video_url, "status": "done", "stage_report": pipeline.stage_report}
+                except Exception as e:
+                    logger.error(f"Batch pipeline failed for {video_url}: {e}", exc_info=True)
+                    result = {"videoUrl": video_url, "status": "failed", "stage_report": None, "error": str(e)}
+                results.append(result)
+                if on_complete:
+                    on_complete(result)
+    finally:
+        for batcher in batchers.values():
+            batcher.close()
+    logger.info(
+        f"Processed {len(results)} videos in {time.perf_counter() - started_at:.1f}s "
+        f"(YOLO batches: {batchers['yolo'].stats()}, CLIP batches: {batchers['clip'].stats()})."
+    )
+    return results
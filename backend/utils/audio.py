@@ -0,0 +1,95 @@
+import subprocess
+import numpy as np
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+WHISPER_SAMPLE_RATE = 16000
+SILENCE_THRESHOLD_DBFS = -50.0
+
+def has_audio_stream(video_path):
+    """
+    Checks whether a video file contains at least one audio stream, using ffprobe.
+
+    Args:
+        video_path (str): Path to the video file.
+
+    Returns:
+        bool or None: True if an audio stream is present, False if the probe found none,
+            None if probing failed (e.g. ffprobe is missing) and the answer is unknown.
+
+    Logs the probe result and errors.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "a",
+        "-show_entries", "stream=index",
+        "-of", "csv=p=0",
+        video_path,
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        has_audio = bool(out.strip())
+        logger.info(f"Audio stream check for {video_path}: {'found' if has_audio else 'none'}.")
+        return has_audio
+    except Exception as e:
+        logger.error(f"Failed to probe audio streams in {video_path}; will try to decode audio anyway: {e}", exc_info=True)
+        return None
+
+def load_audio_array(video_path, sample_rate=WHISPER_SAMPLE_RATE):
+    """
+    Decodes the first audio track of a video straight into memory as mono float32 PCM,
+    which is the input format Whisper expects. No intermediate audio file is written.
+    If the audio probe fails, decoding is attempted anyway rather than assuming silence.
+
+    Args:
+        video_path (str): Path to the video file.
+        sample_rate (int, optional): Output sample rate in Hz. Defaults to 16000.
+
+    Returns:
+        np.ndarray or None: 1-D float32 array in [-1, 1], or None if the video has no audio track.
+
+    Logs decoding progress. Raises exception if ffmpeg fails on a video that has (or may have) audio.
+    """
+    if has_audio_stream(video_path) is False:
+        return None
+    cmd = [
+        "ffmpeg", "-nostdin",
+        "-threads", "0",
+        "-i", video_path,
+        "-map", "0:a:0",
+        "-vn",
+        "-f", "f32le",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors="ignore")
+        if "matches no streams" in stderr:
+            logger.info(f"No audio stream in {video_path}.")
+            return None
+        raise RuntimeError(f"Failed to decode audio from {video_path}: {stderr}") from e
+    audio = np.frombuffer(out, dtype=np.float32)
+    logger.info(f"Decoded {len(audio) / sample_rate:.1f}s of audio from {video_path}.")
+    return audio
+
+def is_silent(audio, threshold_dbfs=SILENCE_THRESHOLD_DBFS):
+    """
+    Checks whether an audio buffer is empty or below a loudness threshold.
+
+    Args:
+        audio (np.ndarray): Float32 PCM samples in [-1, 1].
+        threshold_dbfs (float, optional): RMS level (dBFS) at or below which audio counts as silence. Defaults to -50.
+
+    Returns:
+        bool: True if the audio is empty or silent.
+    """
+    if audio is None or audio.size == 0:
+        return True
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))
+    if rms == 0.0:
+        return True
+    return 20 * np.log10(rms) <= threshold_dbfs
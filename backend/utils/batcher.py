@@ -0,0 +1,101 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from utils.logger import get_logger
+from utils.metrics import MICROBATCH_SIZE
+
+logger = get_logger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Coalesces model calls from several threads into shared batches.
+
+    Callers submit lists of items (frames, crops); a single worker thread takes items off a
+    queue, waits up to max_wait seconds for more to arrive, and passes up to max_batch_size
+    items at a time to process_batch. Items from different callers (e.g. pipelines for
+    different videos) therefore share one forward pass, and each caller gets back exactly
+    the results for its own items, in order.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait=0.02, name="batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit_many(self, items):
+        """
+        Queues items for batched processing and blocks until their results are ready.
+
+        Args:
+            items (list): Inputs accepted by process_batch.
+
+        Returns:
+            list: One result per item, in the same order.
+
+        Re-raises the exception of a failed batch.
+        """
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Stops the worker thread once the items already queued have been processed.
+        """
+        self._queue.put(_STOP)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            items = [item for item, _ in batch]
+            MICROBATCH_SIZE.observe(len(items), batcher=self.name)
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} items")
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(items)} failed: {e}", exc_info=True)
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.items += len(items)
+
+    def stats(self):
+        """
+        Returns the number of batches and items processed and the mean batch size.
+        """
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+        }
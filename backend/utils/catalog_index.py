@@ -0,0 +1,470 @@
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import faiss
+from utils.logger import get_logger
+from utils.checks import file_exists
+from utils.metrics import FAISS_SEARCH_SECONDS
+
+logger = get_logger(__name__)
+
+
+def load_meta(catalog_csv: pd.DataFrame):
+    """
+    Builds a product_id -> metadata lookup from the catalog dataframe.
+
+    Args:
+        catalog_csv (pd.DataFrame): Catalog dataframe with id, title, category, color and image_url columns.
+
+    Returns:
+        dict: Mapping of product_id (str) to a dict with title, category, color and image_url.
+    """
+    meta = {}
+    for _, row in catalog_csv.iterrows():
+        pid = str(row['id'])
+        # Only keep the first occurrence (first shot angle) for each product_id
+        if pid not in meta:
+            meta[pid] = {
+                'title': row['title'],
+                'category': row['category'],
+                'color': row['color'],
+                'image_url': row['image_url']
+            }
+    return meta
+
+
+POOLING_MODES = ("max", "mean")
+
+
+class CatalogIndex:
+    """
+    A FAISS index over the catalog CLIP embeddings together with the product IDs
+    and metadata needed to turn search hits into matches.
+
+    The catalog has several shots per product, so each product can own several vectors;
+    `search_products` aggregates hits per product and returns distinct products. When the
+    catalog vectors are available, searches can be restricted to a set of catalog categories,
+    which are served by small exact sub-indexes built on first use.
+    """
+
+    def __init__(self, index, product_ids, meta, vectors=None):
+        self.index = index
+        self.product_ids = product_ids
+        self.meta = meta
+        self.vectors = vectors
+        self.row_categories = np.asarray([str(meta.get(str(p), {}).get("category")) for p in product_ids])
+        self._category_indexes = {}
+        self._category_lock = threading.Lock()
+        products, self.product_codes = np.unique(np.asarray([str(p) for p in product_ids]), return_inverse=True)
+        self.num_products = len(products)
+        self.shots_per_product = max(1, int(np.ceil(len(product_ids) / max(1, self.num_products))))
+
+    @property
+    def dim(self):
+        return self.index.d
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def search(self, query_embeddings, top_k=1):
+        """
+        Searches the index with one or more query embeddings.
+
+        Args:
+            query_embeddings (np.ndarray): Array of shape (D,) or (N, D).
+            top_k (int): Number of neighbours to return per query.
+
+        Returns:
+            tuple: (scores, indices) arrays of shape (N, top_k).
+        """
+        queries = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype=np.float32)
+        with FAISS_SEARCH_SECONDS.time():
+            return self.index.search(queries, top_k)
+
+    def _pool_row(self, scores, indices, top_k, pooling):
+        valid = indices >= 0
+        scores, indices = scores[valid], indices[valid]
+        codes, first, inverse = np.unique(self.product_codes[indices], return_index=True, return_inverse=True)
+        if pooling == "max":
+            pooled = scores[first]  # FAISS returns hits best-first
+        else:
+            pooled = np.bincount(inverse, weights=scores) / np.bincount(inverse)
+        order = np.argsort(-pooled, kind="stable")[:top_k]
+        return pooled[order], indices[first[order]], len(codes)
+
+    def category_index(self, categories):
+        """
+        Returns an exact sub-index over the catalog rows whose category is in categories, built on first use.
+
+        Args:
+            categories (iterable[str]): Catalog categories to include.
+
+        Returns:
+            tuple or None: (CatalogIndex over the selected rows, np.ndarray mapping its rows to rows of this index),
+                or None if the catalog vectors are not available or no row has one of the categories.
+        """
+        key = frozenset(categories)
+        with self._category_lock:
+            if key not in self._category_indexes:
+                rows = np.flatnonzero(np.isin(self.row_categories, list(key)))
+                sub = None
+                if self.vectors is not None and len(rows):
+                    vectors = np.ascontiguousarray(self.vectors[rows], dtype=np.float32)
+                    index = faiss.IndexFlatIP(vectors.shape[1])
+                    index.add(vectors)
+                    sub = (CatalogIndex(index, [self.product_ids[r] for r in rows], self.meta), rows)
+                    logger.info(f"Built catalog sub-index for {sorted(key)} with {len(rows)} vectors.")
+                self._category_indexes[key] = sub
+            return self._category_indexes[key]
+
+    def search_products(self, query_embeddings, top_k=1, pooling="max", overfetch=4, categories=None):
+        """
+        Searches for the top_k distinct products per query.
+
+        Fetches more vectors than needed, groups the hits by product and pools each product's
+        shot scores, widening the fetch until every query has top_k distinct products or the
+        whole index has been searched. With "mean" pooling a product's score is the mean over
+        its shots among the fetched hits.
+
+        Args:
+            query_embeddings (np.ndarray): Array of shape (D,) or (N, D).
+            top_k (int): Number of distinct products to return per query.
+            pooling (str): "max" or "mean" aggregation of shot scores per product.
+            overfetch (int): Vectors fetched per wanted product, in multiples of the average shots per product.
+            categories (iterable[str], optional): Only return products in these catalog categories.
+                The whole catalog is searched if None or if no sub-index can be built for them.
+
+        Returns:
+            tuple: (scores, indices) arrays of shape (N, top_k). indices point at each product's
+                best-scoring vector; missing results have index -1 and score -inf.
+        """
+        if pooling not in POOLING_MODES:
+            raise ValueError(f"Unknown pooling '{pooling}'; expected one of {POOLING_MODES}")
+        if categories:
+            sub = self.category_index(categories)
+            if sub is not None:
+                sub_index, rows = sub
+                D, I = sub_index.search_products(query_embeddings, top_k, pooling, overfetch)
+                return D, np.where(I >= 0, rows[np.maximum(I, 0)], -1)
+            logger.warning(f"No catalog sub-index for categories {sorted(categories)}; searching the whole catalog.")
+        queries = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype=np.float32)
+        out_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        out_indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        pending = np.arange(len(queries))
+        fetch = min(self.index.ntotal, top_k * self.shots_per_product * max(1, overfetch))
+        while len(pending) and fetch > 0:
+            with FAISS_SEARCH_SECONDS.time():
+                D, I = self.index.search(queries[pending], fetch)
+            unfinished = []
+            for row, q in enumerate(pending):
+                pooled, best, distinct = self._pool_row(D[row], I[row], top_k, pooling)
+                out_scores[q, :len(pooled)] = pooled
+                out_indices[q, :len(best)] = best
+                exhausted = fetch >= self.index.ntotal or (I[row] < 0).any()
+                if distinct < top_k and not exhausted:
+                    unfinished.append(q)
+            pending = np.asarray(unfinished, dtype=np.int64)
+            fetch = min(self.index.ntotal, fetch * 2)
+        return out_scores, out_indices
+
+
+def collapse_duplicate_shots(catalog_embeddings, product_ids, threshold=0.98):
+    """
+    Picks which catalog rows to index when near-identical shots of a product are collapsed.
+    Within each product a shot is kept only if its cosine similarity to every already kept
+    shot of that product is below threshold (e.g. the same image at another size).
+
+    Args:
+        catalog_embeddings (np.ndarray): Normalized catalog embeddings of shape (N, D).
+        product_ids (list): Product ID of each row.
+        threshold (float): Similarity at or above which two shots count as duplicates.
+
+    Returns:
+        list[int]: Positions of the rows to keep, in their original order.
+    """
+    rows_by_product = {}
+    for position, pid in enumerate(product_ids):
+        rows_by_product.setdefault(str(pid), []).append(position)
+    keep = []
+    for rows in rows_by_product.values():
+        kept = [rows[0]]
+        for row in rows[1:]:
+            if np.max(catalog_embeddings[kept] @ catalog_embeddings[row]) < threshold:
+                kept.append(row)
+        keep.extend(kept)
+    keep.sort()
+    logger.info(f"Collapsed {len(product_ids)} catalog shots to {len(keep)} at similarity threshold {threshold}.")
+    return keep
+
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    Which kind of FAISS index to build over the catalog and how to search it.
+
+    index_type is one of INDEX_TYPES:
+        flat      exact inner-product search (the default; fine up to ~100k vectors)
+        ivf_flat  inverted lists over nlist k-means cells; nprobe cells are scanned per query
+        hnsw      HNSW graph with hnsw_m links per node; ef_search controls query-time breadth
+        ivf_pq    inverted lists with product-quantized vectors (pq_m sub-quantizers of pq_nbits
+                  bits each); smallest memory footprint, lowest recall
+    nlist, hnsw_m, ef_construction, pq_m and pq_nbits are build parameters; nprobe and
+    ef_search are applied at search time and can be changed without rebuilding.
+    """
+    index_type: str = "flat"
+    nlist: int = 1024
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    pq_m: int = 32
+    pq_nbits: int = 8
+    nprobe: int = 16
+    ef_search: int = 64
+    collapse_threshold: float = 0.0
+
+    def __post_init__(self):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{self.index_type}'; expected one of {INDEX_TYPES}")
+
+    def build_key(self):
+        """
+        Returns a short name for the build parameters, used to keep differently built indexes apart on disk.
+        """
+        if self.index_type == "flat":
+            key = "flat"
+        elif self.index_type == "ivf_flat":
+            key = f"ivf{self.nlist}_flat"
+        elif self.index_type == "hnsw":
+            key = f"hnsw{self.hnsw_m}_ef{self.ef_construction}"
+        else:
+            key = f"ivf{self.nlist}_pq{self.pq_m}x{self.pq_nbits}"
+        if self.collapse_threshold > 0:
+            key += f"_collapse{round(self.collapse_threshold * 1000)}"
+        return key
+
+    def index_path(self, index_file):
+        """
+        Returns the serialized index path for this spec. The plain flat index keeps index_file itself;
+        other builds get their build key inserted before the extension.
+        """
+        if self.build_key() == "flat":
+            return index_file
+        root, ext = os.path.splitext(index_file)
+        return f"{root}.{self.build_key()}{ext or '.faiss'}"
+
+
+def _effective_nlist(spec, n_vectors):
+    # FAISS wants roughly 39 training points per centroid; shrink nlist for small catalogs.
+    nlist = max(1, min(spec.nlist, n_vectors // 39))
+    if nlist != spec.nlist:
+        logger.warning(f"Reducing nlist from {spec.nlist} to {nlist} for a catalog of {n_vectors} vectors.")
+    return nlist
+
+
+def _new_index(spec, dim, n_vectors):
+    if spec.index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+    if spec.index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, spec.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = spec.ef_construction
+        return index
+    nlist = _effective_nlist(spec, n_vectors)
+    quantizer = faiss.IndexFlatIP(dim)
+    if spec.index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    if dim % spec.pq_m != 0:
+        raise ValueError(f"pq_m={spec.pq_m} must divide the embedding dimension {dim}")
+    return faiss.IndexIVFPQ(quantizer, dim, nlist, spec.pq_m, spec.pq_nbits, faiss.METRIC_INNER_PRODUCT)
+
+
+def apply_search_params(index, spec):
+    """
+    Sets the query-time parameters of spec (nprobe for IVF indexes, efSearch for HNSW) on index.
+
+    Args:
+        index (faiss.Index): The index to configure.
+        spec (IndexSpec): Index settings.
+
+    Returns:
+        faiss.Index: The same index.
+    """
+    if spec.index_type in ("ivf_flat", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(spec.nprobe, ivf.nlist)
+    elif spec.index_type == "hnsw":
+        index.hnsw.efSearch = spec.ef_search
+    return index
+
+
+def build_catalog_index(catalog_embeddings, index_file=None, spec=None):
+    """
+    Builds an inner-product FAISS index over the catalog embeddings and optionally writes it to disk.
+    IVF indexes are trained on the embeddings before they are added.
+
+    Args:
+        catalog_embeddings (np.ndarray): Normalized catalog embeddings of shape (N, D).
+        index_file (str, optional): Path to write the serialized index to.
+        spec (IndexSpec, optional): Index type and parameters. Defaults to an exact flat index.
+
+    Returns:
+        faiss.Index: The built index, with spec's search parameters applied.
+
+    Logs build progress. Raises exception if training or writing fails.
+    """
+    spec = spec or IndexSpec()
+    embeddings = np.ascontiguousarray(catalog_embeddings, dtype=np.float32)
+    start = time.perf_counter()
+    index = _new_index(spec, embeddings.shape[1], len(embeddings))
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    logger.info(f"Built {spec.build_key()} FAISS index with {index.ntotal} vectors of dim {index.d} in {time.perf_counter() - start:.2f}s.")
+    if index_file:
+        write_catalog_index(index, index_file)
+    return apply_search_params(index, spec)
+
+
+def write_catalog_index(index, index_file):
+    """
+    Serializes a FAISS index atomically: it is written to a tmp file private to this process and
+    thread, then renamed over index_file. Readers that have the old file memory-mapped keep their
+    (now unlinked) copy, and concurrent writers never interleave into one file.
+
+    Args:
+        index (faiss.Index): The index to write.
+        index_file (str): Destination path.
+    """
+    os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+    tmp_path = f"{index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, index_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info(f"Saved FAISS index to {index_file}.")
+
+
+def read_catalog_index(index_file):
+    """
+    Reads a serialized FAISS index, memory-mapping it when the FAISS build supports it.
+
+    Args:
+        index_file (str): Path to the serialized index.
+
+    Returns:
+        faiss.Index: The loaded index.
+    """
+    for flag_name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+        flag = getattr(faiss, flag_name, None)
+        if flag is None:
+            continue
+        try:
+            index = faiss.read_index(index_file, flag)
+            logger.info(f"Loaded FAISS index from {index_file} with {flag_name}.")
+            return index
+        except Exception as e:
+            logger.warning(f"Could not mmap FAISS index {index_file} with {flag_name}: {e}")
+    index = faiss.read_index(index_file)
+    logger.info(f"Loaded FAISS index from {index_file} into memory.")
+    return index
+
+
+def _is_stale(index_file, embeddings_file):
+    return (not file_exists(index_file)) or os.path.getmtime(index_file) < os.path.getmtime(embeddings_file)
+
+
+def load_catalog_index(catalog_embeddings_file, catalog_product_ids_file, catalog_csv_file, index_file, spec=None):
+    """
+    Loads the catalog index from disk, building and serializing it first if it is
+    missing or older than the embeddings file.
+
+    Args:
+        catalog_embeddings_file (str): Path to the catalog embeddings (.npy).
+        catalog_product_ids_file (str): Path to the catalog product IDs (.json).
+        catalog_csv_file (str): Path to the catalog CSV.
+        index_file (str): Path of the serialized flat FAISS index; other index types are stored next to it.
+        spec (IndexSpec, optional): Index type and parameters. Defaults to an exact flat index.
+
+    Returns:
+        CatalogIndex: The loaded catalog index.
+
+    Logs loading progress. Raises exception if loading fails.
+    """
+    spec = spec or IndexSpec()
+    index_file = spec.index_path(index_file)
+    rows_file = f"{index_file}.rows.json"
+    with open(catalog_product_ids_file, "r") as f:
+        product_ids = json.load(f)
+
+    def build():
+        embeddings = np.load(catalog_embeddings_file)
+        rows = None
+        if spec.collapse_threshold > 0:
+            rows = collapse_duplicate_shots(embeddings, product_ids, spec.collapse_threshold)
+            embeddings = embeddings[rows]
+        index = build_catalog_index(embeddings, index_file, spec)
+        if rows is not None:
+            tmp_path = f"{rows_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(rows, f)
+            os.replace(tmp_path, rows_file)
+        return index, rows
+
+    rows = None
+    if _is_stale(index_file, catalog_embeddings_file):
+        logger.info(f"FAISS index {index_file} is missing or stale; rebuilding from {catalog_embeddings_file}.")
+        index, rows = build()
+    else:
+        index = apply_search_params(read_catalog_index(index_file), spec)
+        if spec.collapse_threshold > 0 and file_exists(rows_file):
+            with open(rows_file, "r") as f:
+                rows = json.load(f)
+    expected = len(rows) if rows is not None else len(product_ids)
+    if index.ntotal != expected or (spec.collapse_threshold > 0 and rows is None):
+        logger.warning(f"FAISS index has {index.ntotal} vectors but {expected} product IDs; rebuilding.")
+        index, rows = build()
+    vectors = np.load(catalog_embeddings_file, mmap_mode="r")
+    if rows is not None:
+        product_ids = [product_ids[i] for i in rows]
+        vectors = vectors[rows]
+    meta = load_meta(pd.read_csv(catalog_csv_file))
+    return CatalogIndex(index, product_ids, meta, vectors=vectors)
+
+
+_shared_indexes = {}
+_shared_lock = threading.Lock()
+
+
+def get_catalog_index(catalog_embeddings_file, catalog_product_ids_file, catalog_csv_file, index_file, spec=None):
+    """
+    Returns the process-wide CatalogIndex for the given files and index spec, loading it on first use.
+    The shared index is reloaded when any of the underlying files change.
+
+    Args:
+        catalog_embeddings_file (str): Path to the catalog embeddings (.npy).
+        catalog_product_ids_file (str): Path to the catalog product IDs (.json).
+        catalog_csv_file (str): Path to the catalog CSV.
+        index_file (str): Path of the serialized flat FAISS index.
+        spec (IndexSpec, optional): Index type and parameters. Defaults to an exact flat index.
+
+    Returns:
+        CatalogIndex: Shared catalog index.
+    """
+    spec = spec or IndexSpec()
+    files = (catalog_embeddings_file, catalog_product_ids_file, catalog_csv_file, index_file)
+    key = files + (spec,)
+    version = tuple(os.path.getmtime(p) for p in files[:3])
+    with _shared_lock:
+        cached = _shared_indexes.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        catalog_index = load_catalog_index(*files, spec=spec)
+        _shared_indexes[key] = (version, catalog_index)
+        return catalog_index
@@ -0,0 +1,160 @@
+import os
+import queue
+import hashlib
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from PIL import Image
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+INGEST_MAX_WORKERS = 16
+INGEST_RETRIES = 3
+INGEST_TIMEOUT = (5, 20)  # (connect, read) seconds
+
+_DONE = object()
+
+
+def make_ingest_session(max_workers=INGEST_MAX_WORKERS, retries=INGEST_RETRIES):
+    """
+    Returns a requests.Session whose connection pool fits max_workers concurrent fetches
+    and which retries connection errors and 429/5xx responses with exponential backoff.
+
+    Args:
+        max_workers (int, optional): Number of concurrent fetches. Defaults to 16.
+        retries (int, optional): Retries per request. Defaults to 3.
+
+    Returns:
+        requests.Session: Configured session.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def image_cache_path(cache_dir, url):
+    """
+    Returns the on-disk cache path for an image URL (sharded by the first two hex digits of its SHA-1).
+    """
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest[:2], f"{digest}.img")
+
+
+def fetch_image_bytes(url, session, cache_dir=None, timeout=INGEST_TIMEOUT):
+    """
+    Returns the raw bytes of an image, from the local cache if present, otherwise over HTTP
+    (and then stored in the cache).
+
+    Args:
+        url (str): The image URL.
+        session (requests.Session): Session used for the download.
+        cache_dir (str, optional): Directory of the raw image cache. No caching if None.
+        timeout (tuple, optional): (connect, read) timeouts in seconds.
+
+    Returns:
+        bytes: The image bytes.
+
+    Raises exception if the download fails after retries.
+    """
+    path = image_cache_path(cache_dir, url) if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    content = response.content
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return content
+
+
+def ingest_catalog_embeddings(row_keys, embed_batch, batch_size=32, cache_dir=None,
+                              max_workers=INGEST_MAX_WORKERS, queue_size=128, session=None):
+    """
+    Fetches catalog images concurrently and embeds them with CLIP as they arrive.
+
+    A pool of fetcher threads downloads (or reads from the cache) and decodes images, and
+    puts them on a bounded queue; the calling thread takes them off in batches and runs
+    embed_batch (CLIP), so network I/O and model compute overlap. At most max_workers + queue_size
+    decoded images are held in memory at once.
+
+    Args:
+        row_keys (list[tuple]): (product_id, image_url) rows to embed.
+        embed_batch (callable): Maps a list of PIL images to an (N, D) embedding array, e.g. get_clip_embeddings.
+        batch_size (int, optional): Number of images per embed_batch call. Defaults to 32.
+        cache_dir (str, optional): Directory of the raw image cache. No caching if None.
+        max_workers (int, optional): Number of concurrent fetches. Defaults to 16.
+        queue_size (int, optional): Maximum number of decoded images waiting for CLIP. Defaults to 128.
+        session (requests.Session, optional): Session to use; a pooled, retrying one is created if None.
+
+    Yields:
+        tuple: (list of row keys, np.ndarray of shape (len(keys), D)) per embedded batch.
+            Batches arrive in completion order, not in row_keys order.
+
+    Logs progress and failures. Rows whose image cannot be fetched, decoded or embedded are skipped.
+    """
+    session = session or make_ingest_session(max_workers)
+    images = queue.Queue(maxsize=queue_size)
+    stats = {"fetched": 0, "failed": 0}
+    stats_lock = threading.Lock()
+
+    def fetch(key):
+        pid, url = key
+        try:
+            content = fetch_image_bytes(url, session, cache_dir)
+            image = Image.open(BytesIO(content)).convert("RGB")
+            with stats_lock:
+                stats["fetched"] += 1
+            images.put((key, image))
+        except Exception as e:
+            with stats_lock:
+                stats["failed"] += 1
+            logger.warning(f"Skipping catalog image for product_id {pid} ({url}): {e}")
+
+    def produce():
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="catalog-fetch") as executor:
+            for key in row_keys:
+                executor.submit(fetch, key)
+        images.put(_DONE)
+
+    producer = threading.Thread(target=produce, name="catalog-ingest", daemon=True)
+    producer.start()
+
+    embedded = 0
+    batch_keys, batch_images = [], []
+    while True:
+        item = images.get()
+        if item is not _DONE:
+            batch_keys.append(item[0])
+            batch_images.append(item[1])
+        if batch_images and (len(batch_images) >= batch_size or item is _DONE):
+            try:
+                embeddings = embed_batch(batch_images)
+            except Exception as e:
+                embeddings = None
+                logger.warning(f"Skipping {len(batch_keys)} catalog rows due to embedding failure: {e}")
+            if embeddings is not None:
+                embedded += len(batch_keys)
+                yield batch_keys, embeddings
+            batch_keys, batch_images = [], []
+            logger.info(f"Catalog ingest progress: {embedded} embedded, {stats['fetched']} fetched, {stats['failed']} failed of {len(row_keys)}.")
+        if item is _DONE:
+            break
+    producer.join()
@@ -56,4 +56,32 @@ def crop_to_pil(image_path, bbox):
         return crop
     except Exception as e:
         logger.error(f"Failed to crop image {image_path}: {e}", exc_info=True)
-        return None
\ No newline at end of file
+        return None
+
+def crop_array_to_pil(image, bbox):
+    """
+    Crops the region defined by bbox from an in-memory BGR frame and returns an RGB PIL Image.
+
+    Args:
+        image (np.ndarray): Decoded BGR frame of shape (H, W, 3), as returned by OpenCV.
+        bbox (list): [x, y, w, h] bounding box.
+
+    Returns:
+        PIL.Image: Cropped image in memory, or None if cropping fails or the box is empty.
+
+    Logs cropping errors. Returns None if cropping fails.
+    """
+    try:
+        height, width = image.shape[:2]
+        x, y, w, h = bbox
+        x1, y1 = max(0, int(x)), max(0, int(y))
+        x2, y2 = min(width, int(x + w)), min(height, int(y + h))
+        if x2 <= x1 or y2 <= y1:
+            logger.warning(f"Empty crop for bbox {bbox} in frame of size {width}x{height}")
+            return None
+        # BGR -> RGB; the slice is copied so the crop does not keep the whole frame alive
+        crop = image[y1:y2, x1:x2, ::-1].copy()
+        return Image.fromarray(crop)
+    except Exception as e:
+        logger.error(f"Failed to crop in-memory frame with bbox {bbox}: {e}", exc_info=True)
+        return None
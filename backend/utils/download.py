@@ -1,12 +1,42 @@
+import os
+import time
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from io import BytesIO
 from PIL import Image
 import tempfile
 from utils.logger import get_logger
 import cv2
+from urllib.parse import urlparse, unquote
+from config import VIDEOS_DIR, VIDEOS_URL_PATH, LOCAL_VIDEO_HOSTS
 
 logger = get_logger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+DOWNLOAD_TIMEOUT = (5, 30)  # (connect, read) seconds; the read timeout applies per chunk, not to the whole body
+DOWNLOAD_MAX_RETRIES = 3
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Returns the process-wide requests.Session with a pooled HTTP adapter.
+
+    Returns:
+        requests.Session: Shared session reusing connections across downloads.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
 def download_image_to_pil(url):
     """
     Downloads an image from a URL and returns a PIL Image object (in-memory).
@@ -21,7 +51,7 @@ def download_image_to_pil(url):
     """
     try:
         logger.info(f"Downloading image from {url}...")
-        response = requests.get(url, timeout=10)
+        response = get_http_session().get(url, timeout=10)
         response.raise_for_status()
         img = Image.open(BytesIO(response.content)).convert("RGB")
         logger.info(f"Successfully downloaded image from {url}")
@@ -31,9 +61,164 @@ def download_image_to_pil(url):
         return None
 
 
+class VideoDownload:
+    """
+    A video download streaming to a temporary file in a background thread.
+
+    Bytes are written in chunks as they arrive; dropped connections are resumed with
+    HTTP Range requests. Callers can do other work while the download runs and block on
+    `wait()` when they need the file. Throughput and time-to-first-byte are recorded.
+    """
+
+    def __init__(self, video_url, chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT, max_retries=DOWNLOAD_MAX_RETRIES):
+        self.video_url = video_url
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.temp_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        self.bytes_written = 0
+        self.total_bytes = None
+        self.etag = None
+        self.started_at = None
+        self.first_byte_at = None
+        self.finished_at = None
+        self.error = None
+        self.first_bytes = threading.Event()
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"download-{video_url}", daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        session = get_http_session()
+        attempts = 0
+        try:
+            while True:
+                headers = {"Range": f"bytes={self.bytes_written}-"} if self.bytes_written else {}
+                try:
+                    with session.get(self.video_url, stream=True, timeout=self.timeout, headers=headers) as response:
+                        response.raise_for_status()
+                        if self.bytes_written and response.status_code != 206:
+                            # Server ignored the Range header; start over
+                            logger.warning(f"Server did not honour Range for {self.video_url}; restarting download.")
+                            self.temp_file.seek(0)
+                            self.temp_file.truncate()
+                            self.bytes_written = 0
+                        if self.total_bytes is None and response.headers.get("Content-Length"):
+                            self.total_bytes = self.bytes_written + int(response.headers["Content-Length"])
+                        self.etag = self.etag or response.headers.get("ETag")
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            if not chunk:
+                                continue
+                            self.temp_file.write(chunk)
+                            self.bytes_written += len(chunk)
+                            if self.first_byte_at is None:
+                                self.first_byte_at = time.perf_counter()
+                                self.first_bytes.set()
+                    if self.total_bytes is not None and self.bytes_written < self.total_bytes:
+                        raise requests.exceptions.ChunkedEncodingError(
+                            f"Connection closed after {self.bytes_written}/{self.total_bytes} bytes"
+                        )
+                    break
+                except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout) as e:
+                    attempts += 1
+                    if attempts > self.max_retries:
+                        raise
+                    logger.warning(f"Download of {self.video_url} interrupted at {self.bytes_written} bytes ({e}); resuming (attempt {attempts}/{self.max_retries}).")
+                    time.sleep(min(2 ** attempts * 0.5, 5))
+            self.temp_file.flush()
+            self.temp_file.close()
+        except Exception as e:
+            self.error = e
+            self.temp_file.close()
+            if os.path.exists(self.temp_file.name):
+                os.remove(self.temp_file.name)
+            logger.error(f"Failed to download video from {self.video_url}: {e}", exc_info=True)
+        finally:
+            self.finished_at = time.perf_counter()
+            self.first_bytes.set()
+            self.done.set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the download finishes.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait.
+
+        Returns:
+            tempfile._TemporaryFileWrapper: The (closed) temp file holding the video.
+
+        Raises exception if the download failed or did not finish within timeout.
+        """
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"Download of {self.video_url} did not finish within {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.temp_file
+
+    def stats(self):
+        """
+        Returns download statistics.
+
+        Returns:
+            dict: bytes, seconds, bytes_per_sec and time_to_first_byte (seconds, None if unknown).
+        """
+        end = self.finished_at or time.perf_counter()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "bytes": self.bytes_written,
+            "seconds": round(elapsed, 3),
+            "bytes_per_sec": round(self.bytes_written / elapsed, 1) if elapsed > 0 else None,
+            "time_to_first_byte": round(self.first_byte_at - self.started_at, 3) if self.first_byte_at else None,
+        }
+
+
+def start_video_download(video_url, chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT, max_retries=DOWNLOAD_MAX_RETRIES):
+    """
+    Starts streaming a video to a temporary file in the background.
+
+    Args:
+        video_url (str): The video URL.
+        chunk_size (int, optional): Bytes per chunk written to disk. Defaults to 1 MB.
+        timeout (tuple, optional): (connect, read) timeouts in seconds. Defaults to (5, 30).
+        max_retries (int, optional): Number of Range-resumed retries after a dropped connection. Defaults to 3.
+
+    Returns:
+        VideoDownload: The running download.
+    """
+    logger.info(f"Starting streaming download of {video_url}...")
+    return VideoDownload(video_url, chunk_size, timeout, max_retries).start()
+
+
+def fetch_validators(url, timeout=5):
+    """
+    Fetches the ETag and Content-Length of a URL with a HEAD request.
+
+    Args:
+        url (str): The URL.
+        timeout (float, optional): Request timeout in seconds. Defaults to 5.
+
+    Returns:
+        dict or None: etag and content_length (either may be None), or None if the request fails.
+    """
+    try:
+        response = get_http_session().head(url, timeout=timeout, allow_redirects=True)
+        response.raise_for_status()
+        length = response.headers.get("Content-Length")
+        return {"etag": response.headers.get("ETag"), "content_length": int(length) if length else None}
+    except Exception as e:
+        logger.warning(f"HEAD request failed for {url}: {e}")
+        return None
+
+
 def download_video(video_url):
     """
     Downloads a video from a URL and returns a cv2.VideoCapture object and the temp file object.
+    The body is streamed to disk in chunks, so large videos do not sit in memory.
 
     Args:
         video_url (str): The video URL.
@@ -44,15 +229,45 @@ def download_video(video_url):
     Logs download progress and errors. Returns (None, None) if download or opening fails.
     """
     try:
-        logger.info(f"Downloading video from {video_url}...")
-        response = requests.get(video_url, timeout=10)
-        response.raise_for_status()
-        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_video_file:
-            temp_video_file.write(response.content)
-            temp_video_file.flush()
-            video_capture = cv2.VideoCapture(temp_video_file.name)
-            logger.info(f"Successfully downloaded and opened video from {video_url}")
-            return (video_capture, temp_video_file)
+        download = start_video_download(video_url)
+        temp_video_file = download.wait()
+        video_capture = cv2.VideoCapture(temp_video_file.name)
+        logger.info(f"Successfully downloaded and opened video from {video_url} ({download.stats()})")
+        return (video_capture, temp_video_file)
     except Exception as e:
         logger.error(f"Failed to download video from {video_url}: {e}", exc_info=True)
-        return (None, None)
\ No newline at end of file
+        return (None, None)
+
+
+def resolve_local_video(video_url, videos_dir=VIDEOS_DIR, local_hosts=LOCAL_VIDEO_HOSTS, url_path=VIDEOS_URL_PATH):
+    """
+    Resolves a video URL served by our own /videos mount to the file in videos_dir.
+
+    Args:
+        video_url (str): The video URL, e.g. "http://localhost:8000/videos/reel_003.mp4" or "/videos/reel_003.mp4".
+        videos_dir (str, optional): Directory mounted at url_path. Defaults to VIDEOS_DIR.
+        local_hosts (list[str], optional): Hostnames that refer to this server. Defaults to LOCAL_VIDEO_HOSTS.
+        url_path (str, optional): URL path prefix of the mount. Defaults to VIDEOS_URL_PATH.
+
+    Returns:
+        str or None: Absolute path of the local video file, or None if the URL is remote or the file does not exist.
+    """
+    try:
+        parsed = urlparse(video_url)
+        if parsed.scheme not in ("", "http", "https"):
+            return None
+        if parsed.netloc and parsed.hostname not in local_hosts:
+            return None
+        if not parsed.path.startswith(url_path):
+            return None
+        relative = unquote(parsed.path[len(url_path):])
+        root = os.path.realpath(videos_dir)
+        local_path = os.path.realpath(os.path.join(root, relative))
+        # Refuse anything that escapes the mounted directory (e.g. "../")
+        if os.path.commonpath([root, local_path]) != root or not os.path.isfile(local_path):
+            return None
+        logger.info(f"Resolved {video_url} to local file {local_path}")
+        return local_path
+    except Exception as e:
+        logger.error(f"Failed to resolve local video for {video_url}: {e}", exc_info=True)
+        return None
@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+import threading
+import numpy as np
+from PIL import Image
+from utils.logger import get_logger
+from utils.metrics import CACHE_LOOKUPS
+from utils.result_cache import SQLITE_TIMEOUT
+
+logger = get_logger(__name__)
+
+
+def dhash(image, hash_size=16, color_grid=4):
+    """
+    Returns a perceptual hash of an image: the difference hash (sign of horizontal brightness
+    gradients on a (hash_size + 1) x hash_size grayscale thumbnail) followed by a coarse colour
+    signature (the mean of each RGB channel over a color_grid x color_grid grid, quantized to
+    8 levels), as a hex string.
+    Crops that look the same (re-encoded, rescaled or shifted by a pixel or two) get the same hash;
+    crops with the same shape in different colours (e.g. a dress in red and in black) do not.
+
+    Args:
+        image (PIL.Image.Image): The input image.
+        hash_size (int, optional): Grid size; the gradient hash has hash_size**2 bits. Defaults to 16.
+        color_grid (int, optional): Grid size of the colour signature. Defaults to 4.
+
+    Returns:
+        str: Hex digest of the hash.
+    """
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    colors = np.asarray(image.convert("RGB").resize((color_grid, color_grid), Image.BOX), dtype=np.uint8) >> 5
+    return f"{np.packbits(bits).tobytes().hex()}-{colors.tobytes().hex()}"
+
+
+class CropEmbeddingCache:
+    """
+    Persistent, size-bounded cache of CLIP crop embeddings in a SQLite file.
+
+    Entries are keyed by the crop's perceptual hash and the CLIP model name, and evicted
+    least-recently-used once more than max_entries are stored. Hit and miss counts since
+    the cache was opened are available from `stats()`.
+    """
+
+    def __init__(self, db_path, max_entries=100000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS crop_embeddings ("
+            "model TEXT NOT NULL, phash TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "last_access REAL NOT NULL, PRIMARY KEY (model, phash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS crop_embeddings_lru ON crop_embeddings (last_access)")
+        self._conn.commit()
+
+    def get_many(self, model_name, hashes):
+        """
+        Looks up embeddings for several crops and marks the found ones as recently used.
+
+        Args:
+            model_name (str): CLIP model the embeddings were computed with.
+            hashes (list[str]): Perceptual hashes of the crops.
+
+        Returns:
+            dict: Mapping of hash to float32 embedding for the hashes found.
+        """
+        wanted = list(set(hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT phash, dim, vector FROM crop_embeddings WHERE model = ? AND phash IN ({','.join('?' * len(chunk))})",
+                    [model_name] + chunk
+                ).fetchall()
+                for phash, dim, vector in rows:
+                    found[phash] = np.frombuffer(vector, dtype=np.float32, count=dim)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE crop_embeddings SET last_access = ? WHERE model = ? AND phash = ?",
+                    [(now, model_name, phash) for phash in found]
+                )
+                self._conn.commit()
+            hits = sum(1 for h in hashes if h in found)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+        CACHE_LOOKUPS.inc(hits, cache="crop_embedding", result="hit")
+        CACHE_LOOKUPS.inc(len(hashes) - hits, cache="crop_embedding", result="miss")
+        return found
+
+    def put_many(self, model_name, items):
+        """
+        Stores embeddings and evicts least-recently-used entries beyond max_entries.
+
+        Args:
+            model_name (str): CLIP model the embeddings were computed with.
+            items (iterable[tuple]): (hash, embedding) pairs.
+        """
+        now = time.time()
+        rows = [
+            (model_name, phash, int(embedding.shape[-1]), np.ascontiguousarray(embedding, dtype=np.float32).tobytes(), now)
+            for phash, embedding in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO crop_embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            overflow = self._conn.execute("SELECT COUNT(*) FROM crop_embeddings").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM crop_embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM crop_embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                logger.info(f"Evicted {overflow} crop embedding cache entries.")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns hits, misses, hit_ratio and the number of stored entries.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM crop_embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "entries": entries,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_crop_embedding_cache(db_path, max_entries=100000):
+    """
+    Returns the process-wide CropEmbeddingCache for db_path.
+    """
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = CropEmbeddingCache(db_path, max_entries)
+        return _caches[db_path]
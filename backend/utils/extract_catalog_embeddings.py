@@ -1,10 +1,14 @@
 import os
+import threading
 import numpy as np
 import pandas as pd
 import torch
 from transformers import CLIPProcessor, CLIPModel
 from utils.logger import get_logger
-from utils.download import download_image_to_pil
+from utils.catalog_ingest import ingest_catalog_embeddings, INGEST_MAX_WORKERS
+from utils.model_registry import get_model_registry
+from utils.metrics import CLIP_BATCH_SIZE
+from config import CATALOG_IMAGE_CACHE_DIR
 import json
 
 logger = get_logger(__name__)
@@ -35,55 +39,214 @@ def get_clip_embedding(image, clip_model, clip_processor) -> np.ndarray | None:
         return None
 
 
-def extract_and_save_catalog_embeddings(df, models_dir, clip_model="openai/clip-vit-large-patch14"):
+
+def get_clip_embeddings(images, clip_model, clip_processor, batch_size=32) -> np.ndarray:
+    """
+    Extracts normalized CLIP embeddings for a list of PIL images, running them through the model in batches.
+
+    Args:
+        images (list[PIL.Image.Image]): The input images.
+        clip_model (CLIPModel): Pretrained CLIP model.
+        clip_processor (CLIPProcessor): Processor for CLIP model.
+        batch_size (int, optional): Maximum number of images per forward pass. Defaults to 32.
+
+    Returns:
+        np.ndarray: Float32 array of shape (N, D) with one L2-normalized embedding per image.
+
+    Logs embedding extraction progress. Raises exception if extraction fails.
+    """
+    if not images:
+        return np.zeros((0, clip_model.config.projection_dim), dtype=np.float32)
+    batch_size = max(1, int(batch_size))
+    batches = []
+    for start in range(0, len(images), batch_size):
+        inputs = clip_processor(images=images[start:start + batch_size], return_tensors="pt")
+        CLIP_BATCH_SIZE.observe(len(images[start:start + batch_size]))
+        with torch.no_grad():
+            embedding = clip_model.get_image_features(**inputs)
+            embedding = embedding / embedding.norm(p=2, dim=-1, keepdim=True)
+        batches.append(embedding.cpu().numpy().astype(np.float32))
+    logger.info(f"Extracted embeddings for {len(images)} images in {len(batches)} batches")
+    return np.concatenate(batches, axis=0)
+
+def _tmp_path(path):
+    """
+    Returns a tmp path next to path that is private to this process and thread, so concurrent
+    writers never share a tmp file before it is renamed into place.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _atomic_save_npy(path, array):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _atomic_save_json(path, data):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _load_embedding_store(emb_path, rows_path):
+    """
+    Loads the existing embeddings and their (product_id, image_url) row keys.
+    Returns ([], None) if there is no store, or if it predates the row manifest.
+    """
+    if not (os.path.exists(emb_path) and os.path.exists(rows_path)):
+        if os.path.exists(emb_path):
+            logger.warning(f"No row manifest at {rows_path}; existing embeddings cannot be reused and will be rebuilt.")
+        return [], None
+    with open(rows_path, "r") as f:
+        row_keys = [tuple(key) for key in json.load(f)]
+    embeddings = np.load(emb_path)
+    if len(row_keys) != len(embeddings):
+        logger.warning(f"Row manifest has {len(row_keys)} rows but {len(embeddings)} embeddings; rebuilding.")
+        return [], None
+    return row_keys, embeddings
+
+
+def _load_checkpoint(checkpoint_path):
     """
-    Extracts CLIP embeddings for all images in the catalog DataFrame and saves them to disk.
+    Loads rows embedded by an interrupted run. Returns ([], []) if there is no checkpoint.
+    """
+    if not os.path.exists(checkpoint_path):
+        return [], []
+    try:
+        data = np.load(checkpoint_path)
+        row_keys = list(zip(data["ids"].tolist(), data["urls"].tolist()))
+        logger.info(f"Resuming from checkpoint with {len(row_keys)} embedded rows.")
+        return row_keys, list(data["embeddings"])
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+        return [], []
+
+
+def _save_checkpoint(checkpoint_path, row_keys, embeddings):
+    tmp_path = _tmp_path(checkpoint_path)
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            ids=np.array([k[0] for k in row_keys]),
+            urls=np.array([k[1] for k in row_keys]),
+            embeddings=np.stack(embeddings),
+        )
+    os.replace(tmp_path, checkpoint_path)
+    logger.info(f"Checkpointed {len(row_keys)} newly embedded rows to {checkpoint_path}.")
+
+
+def _update_catalog_index(index_path, new_embeddings, all_embeddings, removed_any):
+    """
+    Appends new vectors to the serialized FAISS index, or rebuilds it when rows were removed or it is missing.
+    """
+    from utils.catalog_index import build_catalog_index, write_catalog_index
+    import faiss
+    if not removed_any and os.path.exists(index_path):
+        index = faiss.read_index(index_path)
+        if index.ntotal + len(new_embeddings) == len(all_embeddings):
+            if len(new_embeddings):
+                index.add(np.ascontiguousarray(new_embeddings, dtype=np.float32))
+            write_catalog_index(index, index_path)
+            logger.info(f"Appended {len(new_embeddings)} vectors to FAISS index {index_path}.")
+            return
+    build_catalog_index(all_embeddings, index_path)
+
+
+def extract_and_save_catalog_embeddings(df, models_dir, clip_model="openai/clip-vit-large-patch14", batch_size=32, checkpoint_every=256,
+                                        image_cache_dir=CATALOG_IMAGE_CACHE_DIR, max_workers=INGEST_MAX_WORKERS):
+    """
+    Brings the catalog CLIP embeddings on disk up to date with the catalog DataFrame.
+
+    Only (product_id, image_url) rows that are new compared with the existing store are
+    downloaded and embedded; rows no longer in the catalog are dropped, so a changed
+    image_url counts as one removal and one addition. Newly embedded rows are checkpointed
+    every `checkpoint_every` rows, so an interrupted run resumes where it stopped. Images
+    are fetched concurrently and cached on disk, and embedded as they arrive (see
+    utils.catalog_ingest). The
+    FAISS index next to the embeddings is appended to rather than rebuilt when nothing was removed.
 
     Args:
         df (pd.DataFrame): DataFrame containing 'image_url' and 'id' columns.
         models_dir (str): Directory to save the embeddings and product IDs.
         clip_model (str, optional): Name or path of the CLIP model to use. Defaults to "openai/clip-vit-large-patch14".
+        batch_size (int, optional): Number of images per CLIP forward pass. Defaults to 32.
+        checkpoint_every (int, optional): Number of newly embedded rows between checkpoints. Defaults to 256.
+        image_cache_dir (str, optional): Directory of the raw catalog image cache. Defaults to CATALOG_IMAGE_CACHE_DIR.
+        max_workers (int, optional): Number of concurrent image fetches. Defaults to 16.
 
     Returns:
         tuple: (str, str) Paths to the saved embeddings (.npy) and product IDs (.json) files.
 
-    Logs progress and errors for each image. Skips images that fail to download or embed.
+    Logs progress and errors for each image. Skips images that fail to download or embed; they are retried on the next run.
     """
-    logger.info("Loading CLIP model and processor...")
-    model, clip_processor = get_clip_processor_and_model(clip_model)
+    os.makedirs(models_dir, exist_ok=True)
+    emb_path = os.path.join(models_dir, "catalog_clip_embeddings.npy")
+    ids_path = os.path.join(models_dir, "catalog_product_ids.json")
+    rows_path = os.path.join(models_dir, "catalog_embedding_rows.json")
+    checkpoint_path = os.path.join(models_dir, "catalog_embeddings.checkpoint.npz")
+    index_path = os.path.join(models_dir, "catalog_clip.faiss")
 
     logger.info(f"Reading catalog from DataFrame")
-    image_paths = df['image_url'].tolist()
-    product_ids = df['id'].tolist()
-
-    embeddings = []
-    filtered_product_ids = []
-    for url, pid in zip(image_paths, product_ids):
-        try:
-            image = download_image_to_pil(url)
-            if image is None:
-                raise ValueError("Image download failed.")
-            emb = get_clip_embedding(image, model, clip_processor)
-            if emb is None:
-                raise ValueError("Embedding extraction failed.")
-            embeddings.append(emb)
-            filtered_product_ids.append(pid)
-        except Exception as e:
-            logger.warning(f"Skipping embedding for product_id {pid} due to image/embedding failure: {e}")
-            continue
-
-    if not embeddings:
+    wanted_keys = list(dict.fromkeys(zip(df['id'].astype(str), df['image_url'].astype(str))))
+    wanted = set(wanted_keys)
+
+    existing_keys, existing_embeddings = _load_embedding_store(emb_path, rows_path)
+    kept_positions = [i for i, key in enumerate(existing_keys) if key in wanted]
+    removed_count = len(existing_keys) - len(kept_positions)
+    known = {existing_keys[i] for i in kept_positions}
+
+    new_keys, new_embeddings = _load_checkpoint(checkpoint_path)
+    checkpointed = set(new_keys)
+    kept_checkpoint = [i for i, key in enumerate(new_keys) if key in wanted and key not in known]
+    new_keys = [new_keys[i] for i in kept_checkpoint]
+    new_embeddings = [new_embeddings[i] for i in kept_checkpoint]
+
+    todo = [key for key in wanted_keys if key not in known and key not in checkpointed]
+    logger.info(
+        f"Catalog embedding update: {len(kept_positions)} unchanged, {removed_count} removed, "
+        f"{len(new_keys)} from checkpoint, {len(todo)} to embed."
+    )
+
+    if todo:
+        logger.info("Loading CLIP model and processor...")
+        model, clip_processor = get_model_registry().get_clip(clip_model)
+        since_checkpoint = 0
+        batches = ingest_catalog_embeddings(
+            todo,
+            lambda images: get_clip_embeddings(images, model, clip_processor, batch_size=batch_size),
+            batch_size=batch_size,
+            cache_dir=image_cache_dir,
+            max_workers=max_workers,
+        )
+        for batch_keys, batch_embeddings in batches:
+            new_keys.extend(batch_keys)
+            new_embeddings.extend(batch_embeddings)
+            since_checkpoint += len(batch_keys)
+            if since_checkpoint >= checkpoint_every:
+                _save_checkpoint(checkpoint_path, new_keys, new_embeddings)
+                since_checkpoint = 0
+
+    parts = []
+    if existing_embeddings is not None and kept_positions:
+        parts.append(existing_embeddings[kept_positions])
+    if new_embeddings:
+        parts.append(np.stack(new_embeddings).astype(np.float32))
+    if not parts:
         logger.error("No embeddings were extracted. Nothing will be saved.")
         return None, None
 
-    embeddings = np.stack(embeddings)
-    os.makedirs(models_dir, exist_ok=True)
-    emb_path = os.path.join(models_dir, "catalog_clip_embeddings.npy")
-    ids_path = os.path.join(models_dir, "catalog_product_ids.json")
+    embeddings = np.concatenate(parts, axis=0)
+    row_keys = [existing_keys[i] for i in kept_positions] + new_keys
     try:
-        np.save(emb_path, embeddings)
-        with open(ids_path, "w") as f:
-            json.dump(filtered_product_ids, f)
+        _atomic_save_npy(emb_path, embeddings)
+        _atomic_save_json(ids_path, [pid for pid, _ in row_keys])
+        _atomic_save_json(rows_path, [list(key) for key in row_keys])
+        _update_catalog_index(index_path, np.stack(new_embeddings) if new_embeddings else np.zeros((0, embeddings.shape[1])), embeddings, removed_count > 0)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
         logger.info(f"Saved {len(embeddings)} embeddings to {emb_path} and product IDs to {ids_path}.")
         return emb_path, ids_path
     except Exception as e:
@@ -111,4 +274,9 @@ def get_clip_processor_and_model(clip_model='openai/clip-vit-large-patch14'):
         return model, clip_processor
     except Exception as e:
         logger.error(f"Failed to load CLIP model or processor: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+
+if __name__ == "__main__":
+    from config import CATALOG_CSV_PATH, MODELS_DIR, CLIP_MODEL_NAME
+    extract_and_save_catalog_embeddings(pd.read_csv(CATALOG_CSV_PATH), MODELS_DIR, CLIP_MODEL_NAME)
@@ -0,0 +1,153 @@
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.logger import get_logger
+from utils.metrics import CACHE_LOOKUPS
+
+logger = get_logger(__name__)
+
+LLM_TIMEOUT = (5, 30)  # (connect, read) seconds
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_FACTOR = 0.5
+LLM_RESPONSE_CACHE_SIZE = 1024
+
+
+def normalize_text(text):
+    """
+    Returns text lower-cased with runs of whitespace collapsed, for cache keys.
+    """
+    return " ".join(str(text).split()).lower()
+
+
+def response_cache_key(model, texts, *extra):
+    """
+    Returns a SHA-256 key for an LLM response from the model name, the normalized input texts
+    and any extra values that change the prompt (e.g. a template version).
+
+    Args:
+        model (str): Model name.
+        texts (list[str]): Input texts; empty ones are ignored.
+        *extra: Additional JSON-serializable values to include in the key.
+
+    Returns:
+        str: Hex digest.
+    """
+    payload = {
+        "model": model,
+        "texts": [t for t in (normalize_text(text) for text in texts) if t],
+        "extra": list(extra),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMClient:
+    """
+    Client for an OpenAI-compatible chat completions API (Groq by default).
+
+    Requests share one pooled requests.Session with explicit (connect, read) timeouts and
+    retries with exponential backoff on connection errors and 429/5xx responses, honouring
+    Retry-After. Successful responses can be kept in a bounded in-memory LRU cache under a
+    caller-supplied key (see response_cache_key). Point base_url at a local mock server to
+    test without network access.
+    """
+
+    def __init__(self, base_url, api_key=None, model="llama3-8b-8192", timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, pool_size=8, cache_size=LLM_RESPONSE_CACHE_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=LLM_BACKOFF_FACTOR,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("POST",),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def _cache_put(self, key, value):
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def chat(self, messages, max_tokens=50, temperature=0.2, cache_key=None):
+        """
+        Sends a chat completion request and returns the content of the first choice.
+
+        Args:
+            messages (list[dict]): Chat messages ({"role", "content"}).
+            max_tokens (int, optional): Completion token limit. Defaults to 50.
+            temperature (float, optional): Sampling temperature. Defaults to 0.2.
+            cache_key (str, optional): Key under which the response is cached; no caching if None.
+
+        Returns:
+            str: The completion text.
+
+        Raises requests.HTTPError if the request still fails after retries.
+        """
+        if cache_key is not None:
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM response cache hit for {cache_key[:12]}.")
+                CACHE_LOOKUPS.inc(cache="llm", result="hit")
+                return cached
+            CACHE_LOOKUPS.inc(cache="llm", result="miss")
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        response = self.session.post(f"{self.base_url}/chat/completions", json=data, timeout=self.timeout)
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"]["content"]
+        if cache_key is not None:
+            self._cache_put(cache_key, content)
+        return content
+
+    async def achat(self, messages, max_tokens=50, temperature=0.2, cache_key=None):
+        """
+        Async variant of chat. Runs the request on a worker thread so several requests can be in
+        flight at once over the shared connection pool.
+        """
+        return await asyncio.to_thread(self.chat, messages, max_tokens, temperature, cache_key)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(base_url, api_key=None, model="llama3-8b-8192"):
+    """
+    Returns the process-wide LLMClient for base_url, api_key and model.
+    """
+    key = (base_url, api_key, model)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = LLMClient(base_url, api_key, model)
+        return _clients[key]
@@ -0,0 +1,242 @@
+import math
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+FRAME_COUNT_BUCKETS = (1, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+DETECTION_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 12, 20, 50)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """
+    Base class of the metric types: a name, help text and a fixed set of label names.
+    Each combination of label values gets its own series, created on first use.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        """
+        Returns the metric in the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(
+            f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}"
+            for suffix, values, extra, value in self._samples()
+        )
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count, e.g. cache hits. The name gets a _total suffix.
+    """
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name if name.endswith("_total") else f"{name}_total", documentation, labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._series.items())]
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, e.g. pipelines in flight. An unlabelled gauge can instead
+    read its value from a callback at scrape time (see set_function).
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn):
+        """
+        Reads the gauge's value from fn() whenever metrics are collected, so values that are
+        already tracked elsewhere (e.g. a queue's depth) cost nothing between scrapes.
+        """
+        if self.labelnames:
+            raise ValueError(f"Gauge {self.name} has labels; set_function only supports unlabelled gauges")
+        self._function = fn
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                return [("", (), (), self._function())]
+            except Exception as e:
+                logger.warning(f"Could not collect gauge {self.name}: {e}")
+                return []
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._series.items())]
+
+
+class Histogram(_Metric):
+    """
+    Counts observations into fixed cumulative buckets and keeps their sum, e.g. stage latencies.
+    Observing costs a bisect and a few additions under a lock.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][index] += 1
+            series["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Context manager that observes the seconds spent in its block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            snapshot = [(key, list(s["counts"]), s["sum"]) for key, s in sorted(self._series.items())]
+        samples = []
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", key, (("le", _format_value(bound)),), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Process-wide collection of metrics, rendered together for the /metrics endpoint.
+    Metrics are kept in memory per process; with several API worker processes each one
+    reports its own values.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Adds a metric and returns it. Raises ValueError if the name is taken.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Pipeline
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "flickd_stage_seconds", "Duration of pipeline stages.", ("stage",)))
+PIPELINE_RUNS = REGISTRY.register(Counter(
+    "flickd_pipeline_runs", "Finished pipeline runs by outcome (done, cached or failed).", ("status",)))
+PIPELINES_IN_FLIGHT = REGISTRY.register(Gauge(
+    "flickd_pipelines_in_flight", "Pipelines currently running in this process."))
+FRAMES_PER_VIDEO = REGISTRY.register(Histogram(
+    "flickd_frames_sampled", "Frames sampled per video.", buckets=FRAME_COUNT_BUCKETS))
+DETECTIONS_PER_FRAME = REGISTRY.register(Histogram(
+    "flickd_detections_per_frame", "YOLO detections per sampled frame.", buckets=DETECTION_COUNT_BUCKETS))
+CLIP_BATCH_SIZE = REGISTRY.register(Histogram(
+    "flickd_clip_batch_size", "Images per CLIP forward pass.", buckets=BATCH_SIZE_BUCKETS))
+MICROBATCH_SIZE = REGISTRY.register(Histogram(
+    "flickd_microbatch_size", "Items per batch of the shared cross-video batchers.", ("batcher",), buckets=BATCH_SIZE_BUCKETS))
+FAISS_SEARCH_SECONDS = REGISTRY.register(Histogram(
+    "flickd_faiss_search_seconds", "Duration of FAISS index searches."))
+MODEL_LOAD_SECONDS = REGISTRY.register(Histogram(
+    "flickd_model_load_seconds", "Model load times.", ("kind",)))
+# Hit ratio = rate(flickd_cache_lookups_total{result="hit"}) / rate(flickd_cache_lookups_total)
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "flickd_cache_lookups", "Cache lookups by cache (result, crop_embedding, llm) and result (hit or miss).", ("cache", "result")))
+
+# API
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "flickd_job_queue_depth", "Pipeline jobs waiting to start."))
+JOBS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "flickd_jobs_in_flight", "Pipeline jobs queued or running."))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "flickd_http_request_seconds", "Duration of API requests by route template.", ("method", "route", "status")))
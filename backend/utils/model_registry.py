@@ -0,0 +1,317 @@
+import os
+import time
+import threading
+from utils.logger import get_logger
+from utils.metrics import MODEL_LOAD_SECONDS
+
+logger = get_logger(__name__)
+
+
+def _current_rss_mb():
+    """
+    Returns the resident set size of the current process in megabytes.
+
+    Returns:
+        float or None: Current RSS in MB, or None if it cannot be determined.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        try:
+            import resource
+            # ru_maxrss is the peak RSS in KB on Linux; good enough as a fallback
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        except Exception:
+            return None
+
+
+def _parameter_mb(module):
+    """
+    Returns the size of a torch module's parameters and buffers in megabytes.
+
+    Args:
+        module: A torch.nn.Module (or an object wrapping one, like ultralytics.YOLO).
+
+    Returns:
+        float or None: Parameter size in MB, or None if the object has no parameters.
+    """
+    try:
+        torch_module = getattr(module, "model", module)
+        if not hasattr(torch_module, "parameters"):
+            torch_module = module
+        total = sum(p.numel() * p.element_size() for p in torch_module.parameters())
+        total += sum(b.numel() * b.element_size() for b in torch_module.buffers())
+        return total / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class SerializedModel:
+    """
+    Wraps a model (or a processor or pipeline) so one instance can be shared between threads.
+
+    Calling the object, and calling any method named in locked_methods, runs under a
+    per-instance lock, one call at a time. Other attributes are passed through to the
+    wrapped object.
+    """
+    locked_methods = ()
+
+    def __init__(self, model):
+        self._model = model
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            return self._model(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name in ("_model", "_lock"):
+            raise AttributeError(name)
+        attr = getattr(self._model, name)
+        if name not in self.locked_methods:
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+class SerializedYOLO(SerializedModel):
+    """
+    Shared ultralytics YOLO model. Ultralytics predictors keep per-call state and are not
+    thread-safe, so predict runs one call at a time.
+    """
+    locked_methods = ("predict",)
+
+
+class SerializedWhisper(SerializedModel):
+    """
+    Shared Whisper model. Decoding installs kv-cache hooks on the model's decoder for the
+    duration of each call, so transcribe runs one call at a time.
+    """
+    locked_methods = ("transcribe",)
+
+
+def _serialized(kind, model):
+    """
+    Wraps a model of the given kind the way the registry shares it (see ModelRegistry).
+    """
+    if isinstance(model, SerializedModel):
+        return model
+    if kind == "yolo":
+        return SerializedYOLO(model)
+    if kind == "whisper":
+        return SerializedWhisper(model)
+    if kind == "clip":
+        clip_model, processor = model
+        return clip_model, (processor if isinstance(processor, SerializedModel) else SerializedModel(processor))
+    if kind == "zero_shot":
+        return SerializedModel(model)
+    return model
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models (YOLO, CLIP, Whisper, zero-shot text classifiers).
+
+    Each model is loaded at most once per process, keyed by its kind, name/path and
+    any loader configuration. Load time and memory usage are recorded per model and
+    can be read back with `report()`.
+
+    Models returned by the registry are safe to call from several threads (job workers,
+    pipeline stages, shared batchers): YOLO predict, Whisper transcribe, zero-shot
+    pipeline calls and CLIP processor calls (the fast tokenizer is not re-entrant) are
+    serialized per model. CLIP forward passes under torch.no_grad keep no state and run
+    concurrently.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._stats = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _get_or_load(self, key, loader, size_of=None):
+        """
+        Returns the cached model for `key`, loading it with `loader()` on first use.
+
+        Args:
+            key (tuple): Registry key, e.g. ("yolo", "/path/to/weights.pt").
+            loader (callable): Zero-argument function that loads the model.
+            size_of (callable, optional): Function returning the model's parameter size in MB.
+
+        Returns:
+            Any: The loaded model object.
+
+        Logs load time and memory. Raises exception if loading fails.
+        """
+        if key in self._models:
+            return self._models[key]
+        with self._key_lock(key):
+            if key in self._models:
+                return self._models[key]
+            logger.info(f"Loading model {key}...")
+            rss_before = _current_rss_mb()
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            MODEL_LOAD_SECONDS.observe(load_seconds, kind=key[0])
+            rss_after = _current_rss_mb()
+            rss_delta = (rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+            parameters_mb = size_of(model) if size_of else None
+            self._stats[key] = {
+                "kind": key[0],
+                "name": key[1],
+                "load_seconds": round(load_seconds, 3),
+                "rss_delta_mb": round(rss_delta, 1) if rss_delta is not None else None,
+                "parameters_mb": round(parameters_mb, 1) if parameters_mb is not None else None,
+            }
+            self._models[key] = model
+            logger.info(f"Loaded model {key} in {load_seconds:.2f}s (stats: {self._stats[key]})")
+            return model
+
+    def put(self, kind, name, model):
+        """
+        Registers an already-loaded model under (kind, name), e.g. a small random-weight stub
+        for benchmarks, so later get_* calls for that name return it instead of loading.
+
+        Args:
+            kind (str): Model kind: "yolo", "clip", "whisper" or "zero_shot".
+            name (str): Name or path the model is looked up by.
+            model (Any): The model object (for CLIP, a (CLIPModel, CLIPProcessor) pair).
+        """
+        model = _serialized(kind, model)
+        with self._key_lock((kind, name)):
+            self._models[(kind, name)] = model
+            self._stats[(kind, name)] = {"kind": kind, "name": name, "load_seconds": 0.0, "rss_delta_mb": None, "parameters_mb": None}
+
+    def get_yolo(self, model_path):
+        """
+        Returns a shared YOLO model for the given weights path. Concurrent predict calls
+        on it are serialized (see SerializedYOLO).
+
+        Args:
+            model_path (str): Path to the YOLO weights file.
+
+        Returns:
+            SerializedYOLO: Loaded YOLO model.
+        """
+        def load():
+            from ultralytics import YOLO
+            return _serialized("yolo", YOLO(model_path))
+        return self._get_or_load(("yolo", model_path), load, _parameter_mb)
+
+    def get_clip(self, model_name):
+        """
+        Returns a shared CLIP model and processor for the given model name.
+
+        Args:
+            model_name (str): HuggingFace name or local path of the CLIP model.
+
+        Returns:
+            tuple: (CLIPModel, CLIPProcessor wrapped in a SerializedModel)
+        """
+        def load():
+            from utils.extract_catalog_embeddings import get_clip_processor_and_model
+            model, processor = get_clip_processor_and_model(model_name)
+            model.eval()
+            return _serialized("clip", (model, processor))
+        return self._get_or_load(("clip", model_name), load, lambda m: _parameter_mb(m[0]))
+
+    def get_whisper(self, model_size):
+        """
+        Returns a shared Whisper model of the given size. Concurrent transcribe calls
+        on it are serialized (see SerializedWhisper).
+
+        Args:
+            model_size (str): Whisper model size (e.g., "tiny", "base", "small").
+
+        Returns:
+            SerializedWhisper: Loaded Whisper model.
+        """
+        def load():
+            import whisper
+            return _serialized("whisper", whisper.load_model(model_size))
+        return self._get_or_load(("whisper", model_size), load, _parameter_mb)
+
+    def get_zero_shot(self, model_name):
+        """
+        Returns a shared HuggingFace zero-shot-classification pipeline for the given model.
+
+        Args:
+            model_name (str): HuggingFace model name (e.g., "facebook/bart-large-mnli").
+
+        Returns:
+            SerializedModel: Loaded zero-shot classification pipeline; calls are serialized.
+        """
+        def load():
+            from transformers import pipeline
+            return _serialized("zero_shot", pipeline("zero-shot-classification", model=model_name))
+        return self._get_or_load(("zero_shot", model_name), load, lambda p: _parameter_mb(p.model))
+
+    def warmup(self, yolo_model_path=None, clip_model_name=None, whisper_model_size=None):
+        """
+        Loads the given models and runs a tiny dummy inference so the first real
+        request does not pay for lazy initialisation.
+
+        Args:
+            yolo_model_path (str, optional): YOLO weights to load.
+            clip_model_name (str, optional): CLIP model to load.
+            whisper_model_size (str, optional): Whisper model size to load.
+
+        Logs warmup progress and errors. Failures are logged and do not raise.
+        """
+        if yolo_model_path:
+            try:
+                import numpy as np
+                model = self.get_yolo(yolo_model_path)
+                model.predict(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False, save=False)
+            except Exception as e:
+                logger.error(f"YOLO warmup failed for {yolo_model_path}: {e}", exc_info=True)
+        if clip_model_name:
+            try:
+                import torch
+                from PIL import Image
+                model, processor = self.get_clip(clip_model_name)
+                inputs = processor(images=Image.new("RGB", (64, 64)), return_tensors="pt")
+                with torch.no_grad():
+                    model.get_image_features(**inputs)
+            except Exception as e:
+                logger.error(f"CLIP warmup failed for {clip_model_name}: {e}", exc_info=True)
+        if whisper_model_size:
+            try:
+                self.get_whisper(whisper_model_size)
+            except Exception as e:
+                logger.error(f"Whisper warmup failed for {whisper_model_size}: {e}", exc_info=True)
+        logger.info(f"Model warmup finished: {self.report()}")
+
+    def report(self):
+        """
+        Returns load-time and memory statistics for every loaded model.
+
+        Returns:
+            list[dict]: One dict per model with kind, name, load_seconds, rss_delta_mb and parameters_mb.
+        """
+        return list(self._stats.values())
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    """
+    Returns the process-wide ModelRegistry instance.
+
+    Returns:
+        ModelRegistry: Shared registry.
+    """
+    return _registry
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from dataclasses import asdict
+from utils.logger import get_logger
+from utils.metrics import CACHE_LOOKUPS
+
+logger = get_logger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+SQLITE_TIMEOUT = 30  # seconds to wait for another process's write lock
+
+
+def hash_file(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents, read in chunks.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_version(path):
+    """
+    Returns a cheap version marker (size and mtime) for a file, or None if it does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return f"{stat.st_size}-{int(stat.st_mtime)}"
+
+
+def config_fingerprint(config, fields, version_files=()):
+    """
+    Returns a short hash identifying the pipeline settings that affect results.
+
+    Args:
+        config (dataclass): Pipeline configuration.
+        fields (iterable[str]): Names of the config fields that change pipeline output.
+        version_files (iterable[str], optional): Files (e.g. catalog embeddings) whose version is part of the fingerprint.
+
+    Returns:
+        str: 16-character hex fingerprint.
+    """
+    values = asdict(config)
+    payload = {
+        "config": {field: values[field] for field in fields},
+        "files": {os.path.basename(p): file_version(p) for p in version_files},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Size-bounded, content-addressed cache of pipeline results in a SQLite file.
+
+    Results are stored under a key made from the video's content hash and the pipeline
+    config fingerprint, and evicted least-recently-used once more than max_entries are
+    stored. The cache also remembers which content hash a URL or local file resolved to
+    last time, so a repeat request can be answered before downloading or decoding anything.
+    SQLite serializes writers, so the API process and batch workers can share one cache.
+    """
+
+    def __init__(self, cache_dir, max_entries=1000):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.db_path = os.path.join(cache_dir, "results.sqlite")
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, etag TEXT, content_length INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, version TEXT, content_hash TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(content_hash, fingerprint):
+        return f"{content_hash}-{fingerprint}"
+
+    def get(self, key):
+        """
+        Returns the cached result for key and marks it as recently used, or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                logger.info(f"Result cache miss for {key}.")
+                CACHE_LOOKUPS.inc(cache="result", result="miss")
+                return None
+            try:
+                result = json.loads(row[0])
+            except ValueError as e:
+                logger.warning(f"Dropping unreadable result cache entry {key}: {e}")
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                CACHE_LOOKUPS.inc(cache="result", result="miss")
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            logger.info(f"Result cache hit for {key}.")
+            CACHE_LOOKUPS.inc(cache="result", result="hit")
+            return result
+
+    def put(self, key, result):
+        """
+        Stores a result under key and evicts least-recently-used entries beyond max_entries.
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, json.dumps(result), time.time()))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                logger.info(f"Evicted {overflow} result cache entries.")
+            self._conn.commit()
+            logger.info(f"Stored result cache entry {key}.")
+
+    def file_hash(self, path):
+        """
+        Returns the content hash of a local file, reusing the stored hash while its size and mtime are unchanged.
+        """
+        real_path = os.path.realpath(path)
+        version = file_version(real_path)
+        with self._lock:
+            row = self._conn.execute("SELECT version, content_hash FROM files WHERE path = ?", (real_path,)).fetchone()
+        if row and row[0] == version:
+            return row[1]
+        content_hash = hash_file(real_path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (real_path, version, content_hash))
+            self._conn.commit()
+        return content_hash
+
+    def remember_url(self, url, content_hash, etag=None, content_length=None):
+        """
+        Records the content hash a remote URL resolved to, with its validators.
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)", (url, content_hash, etag, content_length))
+            self._conn.commit()
+
+    def url_hash(self, url):
+        """
+        Returns the remembered content hash and validators for a URL, or None if unknown.
+
+        Returns:
+            dict or None: content_hash, etag and content_length.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash, etag, content_length FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {"content_hash": row[0], "etag": row[1], "content_length": row[2]}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(cache_dir, max_entries=1000):
+    """
+    Returns the process-wide ResultCache for cache_dir.
+    """
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = ResultCache(cache_dir, max_entries)
+        return _caches[cache_dir]
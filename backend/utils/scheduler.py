@@ -0,0 +1,133 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.logger import get_logger
+from utils.metrics import STAGE_SECONDS
+
+logger = get_logger(__name__)
+
+
+class StageScheduler:
+    """
+    Runs a small DAG of pipeline stages on a thread pool.
+
+    Each stage is a callable that receives the results of its dependencies as keyword
+    arguments named after those stages. A stage is submitted as soon as all of its
+    dependencies have finished. Per-stage timings and the run's critical path are
+    recorded and can be read back with `report()`.
+    """
+
+    def __init__(self, max_workers=4, name="pipeline"):
+        self.max_workers = max_workers
+        self.name = name
+        self.stages = {}
+        self.results = {}
+        self.timings = {}
+        self.wall_seconds = None
+
+    def add(self, name, fn, deps=()):
+        """
+        Registers a stage.
+
+        Args:
+            name (str): Unique stage name; also the keyword its result is passed under to dependants.
+            fn (callable): Function called with the dependency results as keyword arguments.
+            deps (iterable[str], optional): Names of stages that must finish first.
+
+        Returns:
+            StageScheduler: self, so calls can be chained.
+
+        Raises ValueError if the name is taken or a dependency is unknown.
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already registered")
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = (fn, tuple(deps))
+        return self
+
+    def _run_stage(self, name, started_at):
+        fn, deps = self.stages[name]
+        start = time.perf_counter()
+        try:
+            return fn(**{dep: self.results[dep] for dep in deps})
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = {
+                "start": round(start - started_at, 3),
+                "end": round(end - started_at, 3),
+                "seconds": round(end - start, 3),
+            }
+            STAGE_SECONDS.observe(end - start, stage=name)
+
+    def run(self):
+        """
+        Runs all stages, respecting dependencies, and returns their results.
+
+        Returns:
+            dict: Mapping of stage name to its return value.
+
+        Logs stage timings and the critical path. Re-raises the first stage exception;
+        stages that have not started yet are cancelled, and results of finished stages
+        stay available in `self.results`.
+        """
+        started_at = time.perf_counter()
+        pending = dict(self.stages)
+        running = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as executor:
+                while pending or running:
+                    ready = [n for n, (_, deps) in pending.items() if all(d in self.results for d in deps)]
+                    for name in ready:
+                        del pending[name]
+                        running[executor.submit(self._run_stage, name, started_at)] = name
+                    if not running:
+                        raise RuntimeError(f"Stages {list(pending)} can never run (dependency cycle)")
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        try:
+                            self.results[name] = future.result()
+                        except Exception:
+                            for other in running:
+                                other.cancel()
+                            raise
+        finally:
+            self.wall_seconds = round(time.perf_counter() - started_at, 3)
+            if self.timings:
+                logger.info(f"{self.name} stage timings: {self.report()}")
+        return self.results
+
+    def critical_path(self):
+        """
+        Returns the chain of finished stages with the largest summed duration.
+
+        Returns:
+            tuple: (list[str] stage names in order, float total seconds).
+        """
+        best = {}
+        for name in self.stages:  # stages are registered after their dependencies
+            if name not in self.timings:
+                continue
+            _, deps = self.stages[name]
+            prev = max((best[d] for d in deps if d in best), key=lambda p: p[1], default=([], 0.0))
+            best[name] = (prev[0] + [name], prev[1] + self.timings[name]["seconds"])
+        if not best:
+            return [], 0.0
+        path, seconds = max(best.values(), key=lambda p: p[1])
+        return path, round(seconds, 3)
+
+    def report(self):
+        """
+        Returns per-stage timings, the wall-clock time and the critical path of the last run.
+
+        Returns:
+            dict: stages (name -> start/end/seconds), wall_seconds, critical_path and critical_path_seconds.
+        """
+        path, seconds = self.critical_path()
+        return {
+            "stages": self.timings,
+            "wall_seconds": self.wall_seconds,
+            "critical_path": path,
+            "critical_path_seconds": seconds,
+        }